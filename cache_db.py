@@ -3,37 +3,628 @@ Cache Database Module
 Provides database access to sports data using SQLite with Redis caching.
 """
 
+import asyncio
 import sqlite3
 import os
+import re
 import time
-from itertools import permutations as _permutations
+import queue
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from itertools import groupby, permutations as _permutations, product as _product
 from typing import Optional, Dict, Any, List
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from operator import itemgetter
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import orjson
 from redis_cache import get_cached_data, set_cached_data
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(__file__), "sports_data.db")
 
-
-def get_db_connection():
-    """Create and return a database connection with optimizations"""
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+# Connection pool size. Connections are opened lazily up to this limit and
+# reused across requests so each one keeps its page cache warm. The executor
+# that runs lookups for the async endpoints gets one worker per connection.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 2 * (os.cpu_count() or 4)))
+
+_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=DB_POOL_SIZE)
+_pool_lock = threading.Lock()
+_pool_opened = 0
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Time budget in seconds for one /cache database lookup (0 disables it). Pooled
+# connections check the calling thread's deadline from a progress handler and
+# interrupt the running statement once it has passed. Off by default until a
+# budget has been measured against the production database; the player
+# substring scan is never bounded (see _deadline_suspended).
+QUERY_TIMEOUT = float(os.getenv('QUERY_TIMEOUT', 0))
+
+_deadline = threading.local()
+
+# In-process LRU in front of Redis for get_cache_entry results, held as orjson
+# bytes so each hit decodes a private copy far faster than deepcopy. Entries
+# expire after LOCAL_CACHE_TTL seconds so data refreshes reach every worker.
+LOCAL_CACHE_SIZE = int(os.getenv('LOCAL_CACHE_SIZE', 4096))
+LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', 60))
+
+_local_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_local_cache_lock = threading.Lock()
+
+# normalize_key(sport name) -> sports.id. The sports table is a small fixed
+# set, so team lookups filter on teams.sport_id instead of joining sports.
+# Loaded at startup (or on first use) and dropped by clear_local_cache().
+SPORT_ID_BY_NAME: Optional[Dict[str, Any]] = None
+
+# Whether sports_data.db has the *_lc search columns (see SEARCH_COLUMNS). Until
+# migrate_search_columns.py has been run on the deployed database, team and
+# player lookups use the unindexed case-insensitive queries in
+# _UNMIGRATED_SEARCH_SQL instead. Checked at startup (or on first use) and
+# dropped by clear_local_cache().
+SEARCH_COLUMNS_READY: Optional[bool] = None
+
+
+def _create_connection() -> sqlite3.Connection:
+    """Create a database connection with optimizations"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
     # Enable WAL mode for better concurrent read performance
     conn.execute("PRAGMA journal_mode=WAL")
-    # Increase cache size (default is 2MB, set to 10MB)
-    conn.execute("PRAGMA cache_size=-10000")
+    # WAL is durable with NORMAL sync; FULL only adds fsyncs
+    conn.execute("PRAGMA synchronous=NORMAL")
     # Use memory for temporary tables
     conn.execute("PRAGMA temp_store=MEMORY")
+    # Increase cache size (default is 2MB, set to 64MB) to keep lookup tables hot
+    conn.execute("PRAGMA cache_size=-65536")
+    # Memory-map up to 256MB of the database file for zero-copy page reads
+    conn.execute("PRAGMA mmap_size=268435456")
+    # Abort statements that outlive the caller's query_deadline()
+    conn.set_progress_handler(_past_deadline, 1000)
     return conn
 
 
+def _past_deadline() -> bool:
+    """Progress handler: True (interrupt) once this thread's deadline has passed."""
+    deadline = getattr(_deadline, "at", None)
+    return deadline is not None and time.monotonic() > deadline
+
+
+@contextmanager
+def query_deadline(timeout: Optional[float]):
+    """
+    Interrupt SQLite statements run by this thread after timeout seconds.
+
+    An interrupted statement raises sqlite3.OperationalError("interrupted").
+    A falsy or non-positive timeout leaves statements unbounded.
+    """
+    if not timeout or timeout <= 0:
+        yield
+        return
+
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = time.monotonic() + timeout
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+@contextmanager
+def _deadline_suspended():
+    """Run statements in this block without the thread's query_deadline()."""
+    previous = getattr(_deadline, "at", None)
+    _deadline.at = None
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+@contextmanager
+def borrow_connection():
+    """
+    Borrow a connection from the pool, returning it when the block exits.
+
+    Opens a new connection while the pool is below DB_POOL_SIZE, otherwise
+    blocks until another request hands one back.
+    """
+    global _pool_opened
+
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            can_open = _pool_opened < DB_POOL_SIZE
+            if can_open:
+                _pool_opened += 1
+        if can_open:
+            try:
+                conn = _create_connection()
+            except Exception:
+                with _pool_lock:
+                    _pool_opened -= 1
+                raise
+        else:
+            conn = _pool.get()
+
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put(conn)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the SQLite executor, creating it on first use."""
+    global _executor
+
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="sqlite")
+        return _executor
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """
+    Await a blocking cache_db call on the dedicated SQLite executor.
+
+    Keeps database lookups off Starlette's shared threadpool, so slow queries
+    cannot starve other sync work, and sizes concurrency to the pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def close_pool():
+    """Stop the executor and close every idle pooled connection (used on shutdown and in tests)."""
+    global _pool_opened, _executor
+
+    with _pool_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+        with _pool_lock:
+            _pool_opened -= 1
+
+
+# SQL statements. Kept as module-level constants so every call passes the
+# identical string and hits the per-connection prepared statement cache.
+# Statements ending in _BY_IDS are templates: fill in the
+# {placeholders} for the IN list with str.format before executing.
+
+# Team lookups
+
+SQL_TEAM_IDS_BY_ALIAS = """
+    SELECT DISTINCT team_id FROM team_aliases
+    WHERE LOWER(alias) = ?
+"""
+
+SQL_TEAM_IDS_BY_NAME_AND_SPORT = """
+    SELECT DISTINCT id FROM teams
+    WHERE (name_lc = ? OR abbr_lc = ?)
+      AND sport_id = ?
+"""
+
+SQL_TEAM_IDS_BY_NAME = """
+    SELECT DISTINCT id FROM teams
+    WHERE name_lc = ? OR abbr_lc = ?
+"""
+
+SQL_TEAM_PLAYERS_BY_IDS_AND_SPORT = """
+    SELECT p.id, p.name, p.first_name, p.last_name, p.position, p.number,
+           p.age, p.height, p.weight,
+           t.name as team_name, t.abbreviation, t.city,
+           l.name as league_name, s.name as sport_name
+    FROM players p
+    JOIN teams t ON p.team_id = t.id
+    LEFT JOIN leagues l ON p.league_id = l.id
+    LEFT JOIN sports s ON p.sport_id = s.id
+    WHERE p.id IN ({placeholders_players})
+      AND p.team_id IN ({placeholders_teams})
+      AND p.sport_id = ?
+"""
+
+SQL_TEAM_PLAYERS_BY_IDS = """
+    SELECT p.id, p.name, p.first_name, p.last_name, p.position, p.number,
+           p.age, p.height, p.weight,
+           t.name as team_name, t.abbreviation, t.city,
+           l.name as league_name, s.name as sport_name
+    FROM players p
+    JOIN teams t ON p.team_id = t.id
+    LEFT JOIN leagues l ON p.league_id = l.id
+    LEFT JOIN sports s ON p.sport_id = s.id
+    WHERE p.id IN ({placeholders_players})
+      AND p.team_id IN ({placeholders_teams})
+"""
+
+SQL_TEAM_IDS_BY_PREFIX_AND_SPORT = """
+    SELECT DISTINCT id FROM teams
+    WHERE ((name_lc >= ? AND name_lc < ?)
+           OR (nickname_lc >= ? AND nickname_lc < ?)
+           OR abbr_lc = ?)
+      AND sport_id = ?
+"""
+
+SQL_TEAM_IDS_BY_PREFIX = """
+    SELECT DISTINCT id FROM teams
+    WHERE (name_lc >= ? AND name_lc < ?)
+       OR (nickname_lc >= ? AND nickname_lc < ?)
+       OR abbr_lc = ?
+"""
+
+SQL_TEAMS_WITH_PLAYERS_BY_IDS_AND_SPORT = """
+    SELECT t.id, t.name, t.abbreviation, t.city, t.mascot, t.nickname,
+           l.name as league_name, s.name as sport_name,
+           p.id, p.name, p.first_name, p.last_name, p.position, p.number,
+           p.age, p.height, p.weight
+    FROM teams t
+    LEFT JOIN leagues l ON t.league_id = l.id
+    LEFT JOIN sports s ON t.sport_id = s.id
+    LEFT JOIN players p ON p.team_id = t.id
+    WHERE t.id IN ({placeholders})
+      AND t.sport_id = ?
+    ORDER BY t.id, p.name
+"""
+
+SQL_TEAMS_WITH_PLAYERS_BY_IDS = """
+    SELECT t.id, t.name, t.abbreviation, t.city, t.mascot, t.nickname,
+           l.name as league_name, s.name as sport_name,
+           p.id, p.name, p.first_name, p.last_name, p.position, p.number,
+           p.age, p.height, p.weight
+    FROM teams t
+    LEFT JOIN leagues l ON t.league_id = l.id
+    LEFT JOIN sports s ON t.sport_id = s.id
+    LEFT JOIN players p ON p.team_id = t.id
+    WHERE t.id IN ({placeholders})
+    ORDER BY t.id, p.name
+"""
+
+
+# Player lookups
+
+SQL_PLAYER_IDS_BY_ALIAS = """
+    SELECT DISTINCT player_id FROM player_aliases
+    WHERE LOWER(alias) = ?
+"""
+
+SQL_PLAYER_IDS_BY_NAME = """
+    SELECT DISTINCT id FROM players
+    WHERE name_lc = ? OR full_name_lc = ?
+"""
+
+SQL_PLAYER_IDS_BY_PREFIX = """
+    SELECT DISTINCT id FROM players
+    WHERE name LIKE ? OR first_name LIKE ? OR last_name LIKE ?
+"""
+
+SQL_PLAYER_IDS_BY_SUBSTRING = """
+    SELECT DISTINCT id FROM players
+    WHERE LOWER(name) LIKE ? OR LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ?
+"""
+
+# The lowercase-column statements above, rewritten for a database that has not
+# been migrated yet. Same parameters and matches, but no index can serve them.
+_UNMIGRATED_SEARCH_SQL = {
+    SQL_TEAM_IDS_BY_NAME_AND_SPORT: """
+        SELECT DISTINCT id FROM teams
+        WHERE (name = ? COLLATE NOCASE OR abbreviation = ? COLLATE NOCASE)
+          AND sport_id = ?
+    """,
+    SQL_TEAM_IDS_BY_NAME: """
+        SELECT DISTINCT id FROM teams
+        WHERE name = ? COLLATE NOCASE OR abbreviation = ? COLLATE NOCASE
+    """,
+    SQL_TEAM_IDS_BY_PREFIX_AND_SPORT: """
+        SELECT DISTINCT id FROM teams
+        WHERE ((LOWER(name) >= ? AND LOWER(name) < ?)
+               OR (LOWER(nickname) >= ? AND LOWER(nickname) < ?)
+               OR LOWER(abbreviation) = ?)
+          AND sport_id = ?
+    """,
+    SQL_TEAM_IDS_BY_PREFIX: """
+        SELECT DISTINCT id FROM teams
+        WHERE (LOWER(name) >= ? AND LOWER(name) < ?)
+           OR (LOWER(nickname) >= ? AND LOWER(nickname) < ?)
+           OR LOWER(abbreviation) = ?
+    """,
+    SQL_PLAYER_IDS_BY_NAME: """
+        SELECT DISTINCT id FROM players
+        WHERE name = ? COLLATE NOCASE
+           OR first_name || ' ' || last_name = ? COLLATE NOCASE
+    """,
+}
+
+SQL_PLAYERS_BY_IDS = """
+    SELECT p.id, p.name, p.first_name, p.last_name, p.position, p.number,
+           p.age, p.height, p.weight,
+           t.name as team_name, l.name as league_name, s.name as sport_name
+    FROM players p
+    LEFT JOIN teams t ON p.team_id = t.id
+    LEFT JOIN leagues l ON p.league_id = l.id
+    LEFT JOIN sports s ON p.sport_id = s.id
+    WHERE p.id IN ({placeholders})
+"""
+
+
+# League lookups
+
+SQL_LEAGUE_IDS_BY_ALIAS = """
+    SELECT DISTINCT league_id FROM league_aliases
+    WHERE LOWER(alias) = ?
+"""
+
+SQL_LEAGUE_IDS_BY_NAME_AND_SPORT = """
+    SELECT DISTINCT l.id FROM leagues l
+    LEFT JOIN sports s ON l.sport_id = s.id
+    WHERE l.name = ? COLLATE NOCASE
+      AND LOWER(s.name) = ?
+"""
+
+SQL_LEAGUE_IDS_BY_NAME = """
+    SELECT DISTINCT id FROM leagues
+    WHERE name = ? COLLATE NOCASE
+"""
+
+SQL_LEAGUE_IDS_BY_SUBSTRING_AND_SPORT = """
+    SELECT DISTINCT l.id FROM leagues l
+    LEFT JOIN sports s ON l.sport_id = s.id
+    WHERE LOWER(l.name) LIKE ?
+      AND LOWER(s.name) = ?
+"""
+
+SQL_LEAGUE_IDS_BY_SUBSTRING = """
+    SELECT DISTINCT id FROM leagues
+    WHERE LOWER(name) LIKE ?
+"""
+
+SQL_LEAGUES_BY_IDS_AND_SPORT = """
+    SELECT l.id, l.name, s.name as sport_name
+    FROM leagues l
+    LEFT JOIN sports s ON l.sport_id = s.id
+    WHERE l.id IN ({placeholders})
+      AND LOWER(s.name) = ?
+"""
+
+SQL_LEAGUES_BY_IDS = """
+    SELECT l.id, l.name, s.name as sport_name
+    FROM leagues l
+    LEFT JOIN sports s ON l.sport_id = s.id
+    WHERE l.id IN ({placeholders})
+"""
+
+SQL_TEAMS_FOR_LEAGUE = """
+    SELECT t.id, t.name, t.abbreviation, t.city, t.mascot, t.nickname
+    FROM teams t
+    WHERE t.league_id = ?
+    ORDER BY t.name
+"""
+
+
+# Market lookups
+
+SQL_MARKET_ID_BY_ALIAS = """
+    SELECT DISTINCT market_id FROM market_aliases
+    WHERE LOWER(REPLACE(REPLACE(alias, ' ', ''), '_', '')) = ?
+    LIMIT 1
+"""
+
+SQL_MARKET_ID_BY_NAME = """
+    SELECT id FROM markets
+    WHERE LOWER(REPLACE(REPLACE(name, ' ', ''), '_', '')) = ?
+    LIMIT 1
+"""
+
+SQL_MARKET_IDS_BY_PREFIX = """
+    SELECT id FROM markets
+    WHERE LOWER(name) LIKE ?
+    ORDER BY LENGTH(name) ASC, name ASC
+"""
+
+SQL_MARKET_NAME_BY_ID = """
+    SELECT name FROM markets WHERE id = ?
+"""
+
+SQL_MARKET_IDS_BY_NAME_PREFIX = """
+    SELECT id FROM markets WHERE LOWER(name) LIKE ? ORDER BY name
+"""
+
+# Market rows with their sport names folded in; split with _split_sports()
+SQL_MARKETS_WITH_SPORTS_BY_IDS = """
+    SELECT m.id, m.name, m.market_type_id, GROUP_CONCAT(s.name, char(31)) AS sports
+    FROM markets m
+    LEFT JOIN market_sports ms ON ms.market_id = m.id
+    LEFT JOIN sports s ON ms.sport_id = s.id
+    WHERE m.id IN ({placeholders})
+    GROUP BY m.id
+    ORDER BY m.name
+"""
+
+
+# Full-table listings
+
+SQL_ALL_TEAMS = """
+    SELECT t.id, t.name, t.abbreviation, l.name as league_name, s.name as sport_name
+    FROM teams t
+    LEFT JOIN leagues l ON t.league_id = l.id
+    LEFT JOIN sports s ON t.sport_id = s.id
+"""
+
+SQL_ALL_PLAYERS = """
+    SELECT p.id, p.name, p.position, t.name as team_name, l.name as league_name, s.name as sport_name
+    FROM players p
+    LEFT JOIN teams t ON p.team_id = t.id
+    LEFT JOIN leagues l ON p.league_id = l.id
+    LEFT JOIN sports s ON p.sport_id = s.id
+"""
+
+SQL_SPORT_IDS = """
+    SELECT id, name FROM sports
+"""
+
+SQL_ALL_MARKETS = """
+    SELECT m.id, m.name, m.market_type_id
+    FROM markets m
+"""
+
+
+# Pre-lowercased search columns maintained by init_search_columns():
+# table -> {column: SQL expression over that table's row ({row} is "" or "NEW.")}
+SEARCH_COLUMNS = {
+    "teams": {
+        "name_lc": "lower({row}name)",
+        "nickname_lc": "lower({row}nickname)",
+        "abbr_lc": "lower({row}abbreviation)",
+    },
+    "players": {
+        "name_lc": "lower({row}name)",
+        "full_name_lc": "lower({row}first_name || ' ' || {row}last_name)",
+    },
+}
+
+# Every search column gets a plain BINARY index (prefix searches are ranges)
+SEARCH_INDEXES = {
+    f"idx_{table}_{column}": (table, column)
+    for table, columns in SEARCH_COLUMNS.items()
+    for column in columns
+}
+
+# Indexes shaped for sport-filtered lookups: teams of one sport in name_lc
+# order. players(team_id, name) hands the team + players join its rows already
+# in ORDER BY order, so it needs no sort step.
+QUERY_PLAN_INDEXES = {
+    "idx_teams_sport_id_name_lc": ("teams", "sport_id, name_lc"),
+    "idx_players_team_id_name": ("players", "team_id, name"),
+}
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _sqlite_lower(value: str) -> str:
+    """Lowercase exactly like SQLite's built-in lower() (ASCII letters only)."""
+    return value.strip().translate(_ASCII_LOWER)
+
+
+def init_search_columns():
+    """
+    Add pre-lowercased search columns to sports_data.db and index them.
+
+    Team and player lookups compare against these columns (see SEARCH_COLUMNS)
+    so SQLite can seek an index instead of evaluating LOWER() on every row.
+    Triggers keep the columns in step with rows inserted or renamed by the
+    data sync. QUERY_PLAN_INDEXES are created alongside, and ANALYZE runs
+    whenever an index is added.
+
+    This rewrites the Git LFS tracked database, so it is a one-off migration
+    (python migrate_search_columns.py) whose result is committed through LFS,
+    not a startup step. Lookups fall back to unindexed queries until then.
+    Safe to run more than once.
+    """
+    with borrow_connection() as conn:
+        for table, columns in SEARCH_COLUMNS.items():
+            existing_columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for column in columns:
+                if column not in existing_columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+            assignments = ", ".join(f"{column} = {expr.format(row='')}" for column, expr in columns.items())
+            new_assignments = ", ".join(f"{column} = {expr.format(row='NEW.')}" for column, expr in columns.items())
+            stale = " OR ".join(f"{column} IS NOT {expr.format(row='')}" for column, expr in columns.items())
+            sources = sorted({name for expr in columns.values() for name in re.findall(r"\{row\}(\w+)", expr)})
+
+            # Backfill rows written before the triggers existed
+            conn.execute(f"UPDATE {table} SET {assignments} WHERE {stale}")
+
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_lc_insert AFTER INSERT ON {table}
+                BEGIN
+                    UPDATE {table} SET {new_assignments} WHERE rowid = NEW.rowid;
+                END
+            """)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_lc_update AFTER UPDATE OF {", ".join(sources)} ON {table}
+                BEGIN
+                    UPDATE {table} SET {new_assignments} WHERE rowid = NEW.rowid;
+                END
+            """)
+
+        # Prefix searches are range comparisons on the raw values, which need
+        # BINARY indexes.
+        created = False
+        for index, (table, column) in {**SEARCH_INDEXES, **QUERY_PLAN_INDEXES}.items():
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone()
+            if row is None:
+                conn.execute(f"CREATE INDEX {index} ON {table}({column})")
+                created = True
+
+        # Give the planner row counts for any index it has not seen yet
+        if created:
+            conn.execute("ANALYZE")
+        conn.commit()
+        check_search_columns(conn)
+
+
+def check_search_columns(active_connection: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    (Re)check whether sports_data.db has the search columns and return it.
+
+    Sets SEARCH_COLUMNS_READY, which decides between the indexed lowercase
+    column queries and the _UNMIGRATED_SEARCH_SQL fallbacks.
+    """
+    global SEARCH_COLUMNS_READY
+
+    with (nullcontext(active_connection) if active_connection else borrow_connection()) as conn:
+        ready = True
+        for table, columns in SEARCH_COLUMNS.items():
+            existing_columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            ready = ready and all(column in existing_columns for column in columns)
+    SEARCH_COLUMNS_READY = ready
+    return ready
+
+
+def _search_sql(conn: sqlite3.Connection, sql: str) -> str:
+    """Return sql, or its unmigrated fallback if the search columns are missing."""
+    ready = SEARCH_COLUMNS_READY
+    if ready is None:
+        ready = check_search_columns(conn)
+    return sql if ready else _UNMIGRATED_SEARCH_SQL[sql]
+
+
+def _split_sports(value: Optional[str]) -> List[str]:
+    """Split a GROUP_CONCAT(sport name, char(31)) column back into a list."""
+    return value.split("\x1f") if value else []
+
+
+def _prefix_range(prefix: str) -> tuple:
+    """
+    Return (lo, hi) such that lo <= value < hi when value starts with prefix.
+
+    Lets prefix matches run as index range scans on the lowercase columns.
+    A trailing U+10FFFF has no successor, so it is dropped and the range widens
+    to the shorter prefix. The successor of U+D7FF skips the surrogate block,
+    which cannot be encoded to bind as a parameter.
+    """
+    stem = prefix.rstrip("\U0010ffff")
+    if not stem:
+        return prefix, prefix  # nothing real sorts past U+10FFFF
+    successor = ord(stem[-1]) + 1
+    if 0xD800 <= successor <= 0xDFFF:
+        successor = 0xE000
+    return prefix, stem[:-1] + chr(successor)
+
+
 def normalize_key(value: str) -> str:
     """Normalize a string for cache lookup (lowercase, strip whitespace)"""
     if not value:
         return ""
-    return value.lower().strip()
+    return value.strip().lower()
 
 
 def get_league_priority(league_name: str) -> int:
@@ -87,17 +678,93 @@ def expand_sports_terms(text: str) -> str:
             
     return text
 
+def _local_cache_key(market, team, player, sport, league) -> tuple:
+    """Key local cache entries the same way Redis keys are normalized."""
+    return (normalize_key(market), normalize_key(team), normalize_key(player),
+            normalize_key(sport), normalize_key(league))
+
+
+def _local_cache_get(key: tuple) -> Optional[Dict[str, Any]]:
+    """Return a freshly decoded copy of a live local cache entry, or None."""
+    with _local_cache_lock:
+        entry = _local_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del _local_cache[key]
+            return None
+        _local_cache.move_to_end(key)
+    return orjson.loads(data)
+
+
+def _local_cache_put(key: tuple, data: Dict[str, Any]):
+    """Store data serialized, evicting the least recently used entry when full."""
+    if LOCAL_CACHE_SIZE <= 0:
+        return
+    entry = (time.monotonic() + LOCAL_CACHE_TTL, orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    with _local_cache_lock:
+        _local_cache[key] = entry
+        _local_cache.move_to_end(key)
+        while len(_local_cache) > LOCAL_CACHE_SIZE:
+            _local_cache.popitem(last=False)
+
+
+def clear_local_cache(
+    market: Optional[str] = None,
+    team: Optional[str] = None,
+    player: Optional[str] = None,
+    sport: Optional[str] = None,
+    league: Optional[str] = None
+) -> None:
+    """
+    Drop in-process cached lookups.
+
+    With no arguments the whole cache is cleared, otherwise only the entry for
+    that exact query. Only affects the current worker process; other workers
+    pick up changes once their entries pass LOCAL_CACHE_TTL.
+    """
+    global SPORT_ID_BY_NAME, SEARCH_COLUMNS_READY
+
+    with _local_cache_lock:
+        if any([market, team, player, sport, league]):
+            _local_cache.pop(_local_cache_key(market, team, player, sport, league), None)
+        else:
+            _local_cache.clear()
+            SPORT_ID_BY_NAME = None
+            SEARCH_COLUMNS_READY = None
+
+
+def load_sport_ids(active_connection: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+    """(Re)load SPORT_ID_BY_NAME from the sports table and return it."""
+    global SPORT_ID_BY_NAME
+
+    with (nullcontext(active_connection) if active_connection else borrow_connection()) as conn:
+        sport_ids = {normalize_key(name): sport_id for sport_id, name in conn.execute(SQL_SPORT_IDS) if name}
+    SPORT_ID_BY_NAME = sport_ids
+    return sport_ids
+
+
+def _sport_id(conn: sqlite3.Connection, normalized_sport: str) -> Any:
+    """Return the sports.id for a normalized sport name, or None if unknown."""
+    sport_ids = SPORT_ID_BY_NAME
+    if sport_ids is None:
+        sport_ids = load_sport_ids(conn)
+    return sport_ids.get(normalized_sport)
+
+
 def get_cache_entry(
     market: Optional[str] = None,
     team: Optional[str] = None,
     player: Optional[str] = None,
     sport: Optional[str] = None,
     league: Optional[str] = None,
-    active_connection: Optional[sqlite3.Connection] = None
+    active_connection: Optional[sqlite3.Connection] = None,
+    timeout: Optional[float] = None
 ) -> Optional[Dict[str, Any]]:
     """
     Retrieve cache entry based on provided parameters.
-    Uses Redis for caching with fallback to SQLite database.
+    Checks an in-process LRU, then Redis, with fallback to SQLite database.
     
     Relationships:
     - ONE-TO-MANY: Team → Players (one team has many players)
@@ -111,763 +778,696 @@ def get_cache_entry(
         sport: Sport name
         league: League name
         active_connection: Optional existing DB connection to reuse (optimization for batch queries)
+        timeout: Optional database time budget in seconds; past it the query raises
+            sqlite3.OperationalError("interrupted")
     
     Returns:
         Dictionary with cache entry data or None if not found
     """
     
-    # Try to get from Redis cache first
+    # Try the in-process cache, then Redis
+    local_key = _local_cache_key(market, team, player, sport, league)
+    cached_result = _local_cache_get(local_key)
+    if cached_result is not None:
+        return cached_result
+
     cached_result = get_cached_data(market=market, team=team, player=player, sport=sport, league=league)
     if cached_result is not None:
+        _local_cache_put(local_key, cached_result)
         return cached_result
     
-    # Cache miss - query database
-    if active_connection:
-        conn = active_connection
-        should_close = False
-    else:
-        conn = get_db_connection()
-        should_close = True
-        
+    # Cache miss - query database (reuse the caller's connection when given)
+    with (nullcontext(active_connection) if active_connection else borrow_connection()) as conn:
+        with query_deadline(timeout):
+            result = _query_cache_entry(conn, market, team, player, sport, league)
+    if result is not None:
+        _local_cache_put(local_key, result)
+    return result
+
+
+def _query_cache_entry(
+    conn: sqlite3.Connection,
+    market: Optional[str],
+    team: Optional[str],
+    player: Optional[str],
+    sport: Optional[str],
+    league: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """Run the database lookup for get_cache_entry on the given connection."""
+    lookups = _LOOKUP_CHAINS[(bool(market), bool(team), bool(player), bool(league))]
     cursor = conn.cursor()
     
     try:
-        # Special case: BOTH team AND player provided - search for player filtered by team
-        if team and player:
-            normalized_team = normalize_key(team)
-            normalized_player = normalize_key(player)
-            normalized_sport = normalize_key(sport) if sport else None
-            
-            # Search for player in BOTH player_aliases AND players table
-            # 1. Check player_aliases
-            cursor.execute("""
-                SELECT DISTINCT player_id FROM player_aliases
-                WHERE LOWER(alias) = ?
-            """, (normalized_player,))
-            player_ids_from_aliases = [row[0] for row in cursor.fetchall()]
-            
-            # 2. Check players table directly
-            # Try exact match first (much faster)
-            cursor.execute("""
-                SELECT DISTINCT id FROM players
-                WHERE name = ? COLLATE NOCASE
-            """, (player.strip(),))
-            player_ids_from_main = [row[0] for row in cursor.fetchall()]
+        for lookup in lookups:
+            result = lookup(cursor, market, team, player, sport, league)
+            if result is not _FALL_THROUGH:
+                return result
+        
+        # No match found
+        return None
+        
+    finally:
+        cursor.close()
 
-            if not player_ids_from_main and len(normalized_player) > 2:
-                # Fallback to slower partial match - Try prefix first (Index Friendly)
-                cursor.execute("""
-                    SELECT DISTINCT id FROM players
-                    WHERE name LIKE ? OR first_name LIKE ? OR last_name LIKE ?
-                """, (f"{normalized_player}%", f"{normalized_player}%", f"{normalized_player}%"))
-                player_ids_from_main = [row[0] for row in cursor.fetchall()]
 
-                # STRICT PERFORMANCE MODE: Disabled full wildcard scan for players
-                # Only prefix matching is allowed to prevent DB lockups during batch processing.
-                # If specific fuzzy matching is needed, use a dedicated search endpoint or search service.
+def _lookup_team_player(
+    cursor: sqlite3.Cursor,
+    market: Optional[str],
+    team: Optional[str],
+    player: Optional[str],
+    sport: Optional[str],
+    league: Optional[str]
+) -> Any:
+    """Player lookup restricted to the given team (team + player queries)."""
+    normalized_team = normalize_key(team)
+    normalized_player = normalize_key(player)
+    team_lc = _sqlite_lower(team)
+    player_lc = _sqlite_lower(player)
+    normalized_sport = normalize_key(sport) if sport else None
+    sport_id = _sport_id(cursor.connection, normalized_sport) if normalized_sport else None
+    if normalized_sport and sport_id is None:
+        # Unknown sport: no team can match
+        return None
+    
+    # Search for player in BOTH player_aliases AND players table
+    # 1. Check player_aliases
+    cursor.execute(SQL_PLAYER_IDS_BY_ALIAS, (normalized_player,))
+    player_ids_from_aliases = [row[0] for row in cursor.fetchall()]
+    
+    # 2. Check players table directly
+    # Try exact match first (much faster)
+    cursor.execute(_search_sql(cursor.connection, SQL_PLAYER_IDS_BY_NAME), (player_lc, player_lc))
+    player_ids_from_main = [row[0] for row in cursor.fetchall()]
 
+    if not player_ids_from_main and len(normalized_player) > 2:
+        # Fallback to slower partial match - Try prefix first (Index Friendly)
+        prefix_pattern = f"{normalized_player}%"
+        cursor.execute(SQL_PLAYER_IDS_BY_PREFIX, (prefix_pattern, prefix_pattern, prefix_pattern))
+        player_ids_from_main = [row[0] for row in cursor.fetchall()]
 
-            
-            player_ids = list(set(player_ids_from_aliases + player_ids_from_main))
-            
-            if not player_ids:
-                return None
-            
-            # Search for team in BOTH team_aliases AND teams table
-            # 1. Check team_aliases
-            cursor.execute("""
-                SELECT DISTINCT team_id FROM team_aliases
-                WHERE LOWER(alias) = ?
-            """, (normalized_team,))
-            team_ids_from_aliases = [row[0] for row in cursor.fetchall()]
-            
-            # 2. Check teams table directly
-            team_ids_from_main = []
-            
-            # Try exact match first
-            if normalized_sport:
-                cursor.execute("""
-                    SELECT DISTINCT t.id FROM teams t
-                    LEFT JOIN sports s ON t.sport_id = s.id
-                    WHERE (t.name = ? COLLATE NOCASE OR t.abbreviation = ? COLLATE NOCASE)
-                      AND LOWER(s.name) = ?
-                """, (team.strip(), team.strip(), normalized_sport))
-            else:
-                cursor.execute("""
-                    SELECT DISTINCT id FROM teams
-                    WHERE name = ? COLLATE NOCASE OR abbreviation = ? COLLATE NOCASE
-                """, (team.strip(), team.strip()))
-            
-            team_ids_from_main = [row[0] for row in cursor.fetchall()]
-            
-            if not team_ids_from_main:
-                # Fallback to slower partial match
-                if normalized_sport:
-                    cursor.execute("""
-                        SELECT DISTINCT t.id FROM teams t
-                        LEFT JOIN sports s ON t.sport_id = s.id
-                        WHERE (LOWER(t.name) LIKE ? OR LOWER(t.nickname) LIKE ? OR LOWER(t.abbreviation) = ?)
-                          AND LOWER(s.name) = ?
-                    """, (f"%{normalized_team}%", f"%{normalized_team}%", normalized_team, normalized_sport))
-                else:
-                    cursor.execute("""
-                        SELECT DISTINCT id FROM teams
-                        WHERE LOWER(name) LIKE ? OR LOWER(nickname) LIKE ? OR LOWER(abbreviation) = ?
-                    """, (f"%{normalized_team}%", f"%{normalized_team}%", normalized_team))
-                
-                team_ids_from_main = [row[0] for row in cursor.fetchall()]
-            
-            team_ids = list(set(team_ids_from_aliases + team_ids_from_main))
-            
-            if not team_ids:
-                return None
-            
-            # Search for player(s) matching player_id AND team_id, filtered by sport if provided
-            placeholders_players = ','.join('?' * len(player_ids))
-            placeholders_teams = ','.join('?' * len(team_ids))
-            
-            if normalized_sport:
-                cursor.execute(f"""
-                    SELECT p.id, p.name, p.first_name, p.last_name, p.position, p.number,
-                           p.age, p.height, p.weight,
-                           t.name as team_name, t.abbreviation, t.city,
-                           l.name as league_name, s.name as sport_name
-                    FROM players p
-                    JOIN teams t ON p.team_id = t.id
-                    LEFT JOIN leagues l ON p.league_id = l.id
-                    LEFT JOIN sports s ON p.sport_id = s.id
-                    WHERE p.id IN ({placeholders_players})
-                      AND p.team_id IN ({placeholders_teams})
-                      AND LOWER(s.name) = ?
-                    ORDER BY p.name
-                """, (*player_ids, *team_ids, normalized_sport))
-            else:
-                cursor.execute(f"""
-                    SELECT p.id, p.name, p.first_name, p.last_name, p.position, p.number,
-                           p.age, p.height, p.weight,
-                           t.name as team_name, t.abbreviation, t.city,
-                           l.name as league_name, s.name as sport_name
-                    FROM players p
-                    JOIN teams t ON p.team_id = t.id
-                    LEFT JOIN leagues l ON p.league_id = l.id
-                    LEFT JOIN sports s ON p.sport_id = s.id
-                    WHERE p.id IN ({placeholders_players})
-                      AND p.team_id IN ({placeholders_teams})
-                    ORDER BY p.name
-                """, (*player_ids, *team_ids))
-            
-            results = cursor.fetchall()
-            if results:
-                players_data = []
-                
-                for result in results:
-                    players_data.append({
-                        "id": result["id"],
-                        "normalized_name": result["name"],
-                        "first_name": result["first_name"],
-                        "last_name": result["last_name"],
-                        "position": result["position"],
-                        "number": result["number"],
-                        "age": result["age"],
-                        "height": result["height"],
-                        "weight": result["weight"],
-                        "team": result["team_name"],
-                        "team_abbreviation": result["abbreviation"],
-                        "team_city": result["city"],
-                        "league": result["league_name"],
-                        "sport": result["sport_name"]
-                    })
-                
-                result_data = {
-                    "type": "player",
-                    "query": {
-                        "player": player,
-                        "team": team,
-                        "sport": sport
-                    },
-                    "players": players_data,
-                    "player_count": len(players_data)
-                }
-                
-                # Cache the result
-                set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
-                return result_data
-            else:
-                # No player found in that specific team
-                return None
+        # STRICT PERFORMANCE MODE: Disabled full wildcard scan for players
+        # Only prefix matching is allowed to prevent DB lockups during batch processing.
+        # If specific fuzzy matching is needed, use a dedicated search endpoint or search service.
+
+
+    
+    player_ids = list(set(player_ids_from_aliases + player_ids_from_main))
+    
+    if not player_ids:
+        return None
+    
+    # Search for team in BOTH team_aliases AND teams table
+    # 1. Check team_aliases
+    cursor.execute(SQL_TEAM_IDS_BY_ALIAS, (normalized_team,))
+    team_ids_from_aliases = [row[0] for row in cursor.fetchall()]
+    
+    # 2. Check teams table directly
+    team_ids_from_main = []
+    
+    # Try exact match first
+    if normalized_sport:
+        cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_NAME_AND_SPORT), (team_lc, team_lc, sport_id))
+    else:
+        cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_NAME), (team_lc, team_lc))
+    
+    team_ids_from_main = [row[0] for row in cursor.fetchall()]
+    
+    if not team_ids_from_main:
+        # Fallback to a prefix match as a range on the lowercase columns (index seek, no LIKE)
+        prefix_lo, prefix_hi = _prefix_range(team_lc)
+        if normalized_sport:
+            cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_PREFIX_AND_SPORT), (prefix_lo, prefix_hi, prefix_lo, prefix_hi, team_lc, sport_id))
+        else:
+            cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_PREFIX), (prefix_lo, prefix_hi, prefix_lo, prefix_hi, team_lc))
         
-        # Priority: team > player > market
-        if team:
-            normalized_team = normalize_key(team)
-            normalized_sport = normalize_key(sport) if sport else None
-            
-            # Search in BOTH team_aliases AND teams table
-            # 1. Check team_aliases table
-            cursor.execute("""
-                SELECT DISTINCT team_id FROM team_aliases
-                WHERE LOWER(alias) = ?
-            """, (normalized_team,))
-            team_ids_from_aliases = [row[0] for row in cursor.fetchall()]
+        team_ids_from_main = [row[0] for row in cursor.fetchall()]
+    
+    team_ids = list(set(team_ids_from_aliases + team_ids_from_main))
+    
+    if not team_ids:
+        return None
+    
+    # Search for player(s) matching player_id AND team_id, filtered by sport if provided
+    placeholders_players = ','.join('?' * len(player_ids))
+    placeholders_teams = ','.join('?' * len(team_ids))
+    
+    if normalized_sport:
+        cursor.execute(SQL_TEAM_PLAYERS_BY_IDS_AND_SPORT.format(placeholders_players=placeholders_players, placeholders_teams=placeholders_teams), (*player_ids, *team_ids, sport_id))
+    else:
+        cursor.execute(SQL_TEAM_PLAYERS_BY_IDS.format(placeholders_players=placeholders_players, placeholders_teams=placeholders_teams), (*player_ids, *team_ids))
+    
+    results = cursor.fetchall()
+    if results:
+        players_data = []
+        
+        for result in results:
+            players_data.append({
+                "id": result["id"],
+                "normalized_name": result["name"],
+                "first_name": result["first_name"],
+                "last_name": result["last_name"],
+                "position": result["position"],
+                "number": result["number"],
+                "age": result["age"],
+                "height": result["height"],
+                "weight": result["weight"],
+                "team": result["team_name"],
+                "team_abbreviation": result["abbreviation"],
+                "team_city": result["city"],
+                "league": result["league_name"],
+                "sport": result["sport_name"]
+            })
+        
+        # Usually one or two rows, so sort here rather than in SQLite
+        players_data.sort(key=lambda x: x["normalized_name"] or "")
+        
+        result_data = {
+            "type": "player",
+            "query": {
+                "player": player,
+                "team": team,
+                "sport": sport
+            },
+            "players": players_data,
+            "player_count": len(players_data)
+        }
+        
+        # Cache the result
+        set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
+        return result_data
+    else:
+        # No player found in that specific team
+        return None
+
+
+def _lookup_team(
+    cursor: sqlite3.Cursor,
+    market: Optional[str],
+    team: Optional[str],
+    player: Optional[str],
+    sport: Optional[str],
+    league: Optional[str]
+) -> Any:
+    """Team lookup: every matching team with its players."""
+    normalized_team = normalize_key(team)
+    normalized_sport = normalize_key(sport) if sport else None
+    sport_id = _sport_id(cursor.connection, normalized_sport) if normalized_sport else None
+    if normalized_sport and sport_id is None:
+        # Unknown sport: no team can match, but a later lookup still might
+        return _FALL_THROUGH
+    team_lc = _sqlite_lower(team)
+    
+    # Search in BOTH team_aliases AND teams table
+    # 1. Check team_aliases table
+    cursor.execute(SQL_TEAM_IDS_BY_ALIAS, (normalized_team,))
+    team_ids_from_aliases = [row[0] for row in cursor.fetchall()]
+    
+    # 2. Check teams table directly (name, nickname, abbreviation)
+    team_ids_from_main = []
+    
+    # Try exact match first
+    if normalized_sport:
+        cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_NAME_AND_SPORT), (team_lc, team_lc, sport_id))
+    else:
+        cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_NAME), (team_lc, team_lc))
+        
+    team_ids_from_main = [row[0] for row in cursor.fetchall()]
+    
+    # For short strings, SKIP fuzzy search to prevent performance kill (LIKE '%a%' matches everything)
+    if not team_ids_from_main and len(normalized_team) > 2:
+        # Prefix match as a range on the lowercase columns (index seek, no LIKE)
+        prefix_lo, prefix_hi = _prefix_range(team_lc)
+        if normalized_sport:
+            cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_PREFIX_AND_SPORT), (prefix_lo, prefix_hi, prefix_lo, prefix_hi, team_lc, sport_id))
+            team_ids_from_main = [row[0] for row in cursor.fetchall()]
             
-            # 2. Check teams table directly (name, nickname, abbreviation)
-            team_ids_from_main = []
+            # STRICT PERFORMANCE MODE: Disabled full wildcard scan for teams
             
-            # Try exact match first
-            if normalized_sport:
-                cursor.execute("""
-                    SELECT DISTINCT t.id FROM teams t
-                    LEFT JOIN sports s ON t.sport_id = s.id
-                    WHERE (t.name = ? COLLATE NOCASE OR t.abbreviation = ? COLLATE NOCASE)
-                      AND LOWER(s.name) = ?
-                """, (team.strip(), team.strip(), normalized_sport))
-            else:
-                cursor.execute("""
-                    SELECT DISTINCT id FROM teams
-                    WHERE name = ? COLLATE NOCASE OR abbreviation = ? COLLATE NOCASE
-                """, (team.strip(), team.strip()))
-                
+        else:
+            cursor.execute(_search_sql(cursor.connection, SQL_TEAM_IDS_BY_PREFIX), (prefix_lo, prefix_hi, prefix_lo, prefix_hi, team_lc))
             team_ids_from_main = [row[0] for row in cursor.fetchall()]
-            
-            # For short strings, SKIP fuzzy search to prevent performance kill (LIKE '%a%' matches everything)
-            if not team_ids_from_main and len(normalized_team) > 2:
-                if normalized_sport:
-                    # Try prefix match first (Index Friendly)
-                    cursor.execute("""
-                        SELECT DISTINCT t.id FROM teams t
-                        LEFT JOIN sports s ON t.sport_id = s.id
-                        WHERE (t.name LIKE ? OR t.nickname LIKE ? OR t.abbreviation = ?)
-                          AND LOWER(s.name) = ?
-                    """, (f"{normalized_team}%", f"{normalized_team}%", normalized_team, normalized_sport))
-                    team_ids_from_main = [row[0] for row in cursor.fetchall()]
-                    
-                    # STRICT PERFORMANCE MODE: Disabled full wildcard scan for teams
-                    
-                else:
-                    # Try prefix match first (Index Friendly)
-                    cursor.execute("""
-                        SELECT DISTINCT id FROM teams
-                        WHERE name LIKE ? OR nickname LIKE ? OR abbreviation = ?
-                    """, (f"{normalized_team}%", f"{normalized_team}%", normalized_team))
-                    team_ids_from_main = [row[0] for row in cursor.fetchall()]
 
-                    # STRICT PERFORMANCE MODE: Disabled full wildcard scan for teams
+            # STRICT PERFORMANCE MODE: Disabled full wildcard scan for teams
 
-            team_ids = list(set(team_ids_from_aliases + team_ids_from_main))
-            
-            if not team_ids:
-                return None
-            
-            # Search for ALL teams matching team_id(s) AND sport (case-insensitive)
-            placeholders = ','.join('?' * len(team_ids))
-            
-            if normalized_sport:
-                cursor.execute(f"""
-                    SELECT t.id, t.name, t.abbreviation, t.city, t.mascot, t.nickname,
-                           l.name as league_name, s.name as sport_name
-                    FROM teams t
-                    LEFT JOIN leagues l ON t.league_id = l.id
-                    LEFT JOIN sports s ON t.sport_id = s.id
-                    WHERE t.id IN ({placeholders})
-                      AND LOWER(s.name) = ?
-                    ORDER BY t.name
-                """, (*team_ids, normalized_sport))
-            else:
-                # Fallback if sport not provided (shouldn't happen due to API validation)
-                cursor.execute(f"""
-                    SELECT t.id, t.name, t.abbreviation, t.city, t.mascot, t.nickname,
-                           l.name as league_name, s.name as sport_name
-                    FROM teams t
-                    LEFT JOIN leagues l ON t.league_id = l.id
-                    LEFT JOIN sports s ON t.sport_id = s.id
-                    WHERE t.id IN ({placeholders})
-                    ORDER BY t.name
-                """, tuple(team_ids))
-            
-            results = cursor.fetchall()
-            if results:
-                teams_data = []
-                
-                # Process each matching team
-                for result in results:
-                    team_id = result["id"]
-                    
-                    # Get all players for this team (ONE-TO-MANY relationship)
-                    cursor.execute("""
-                        SELECT p.id, p.name, p.first_name, p.last_name, p.position, 
-                               p.number, p.age, p.height, p.weight
-                        FROM players p
-                        WHERE p.team_id = ?
-                        ORDER BY p.name
-                    """, (team_id,))
-                    
-                    player_rows = cursor.fetchall()
-                    team_filename = result["name"].replace(" ", "_")
-                    sport_lower = (result["sport_name"] or "").lower()
-                    league_lower = (result["league_name"] or "").lower()
-                    team_folder = result["name"].replace(" ", "_").lower()
-
-                    players = []
-                    for p_row in player_rows:
-                        p_dict = dict(p_row)
-                        player_filename = (p_row["name"] or "").replace(" ", "_").lower()
-                        p_logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "players", sport_lower, league_lower, team_folder, f"{player_filename}.png")
-                        p_dict["logo_url"] = f"/static/logo/players/{sport_lower}/{league_lower}/{team_folder}/{player_filename}.png" if os.path.exists(p_logo_path) else None
-                        players.append(p_dict)
-
-                    logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "teams", sport_lower, league_lower, f"{team_filename}.png")
-                    logo_url = f"/static/logo/teams/{sport_lower}/{league_lower}/{team_filename}.png" if os.path.exists(logo_path) else None
-
-                    teams_data.append({
-                        "id": result["id"],
-                        "normalized_name": result["name"],
-                        "abbreviation": result["abbreviation"],
-                        "city": result["city"],
-                        "mascot": result["mascot"],
-                        "nickname": result["nickname"],
-                        "league": result["league_name"],
-                        "sport": result["sport_name"],
-                        "logo_url": logo_url,
-                        "players": players,
-                        "player_count": len(players)
-                    })
-                
-                # Sort teams by league priority
-                teams_data.sort(key=lambda x: (get_league_priority(x.get("league", "")), x.get("normalized_name", "")))
-                
-                result_data = {
-                    "type": "team",
-                    "query": team,
-                    "teams": teams_data,
-                    "team_count": len(teams_data)
-                }
-                
-                # Cache the result
-                set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
-                return result_data
+    team_ids = list(set(team_ids_from_aliases + team_ids_from_main))
+    
+    if not team_ids:
+        return None
+    
+    # Fetch ALL teams matching team_id(s) AND sport together with their players
+    # (ONE-TO-MANY relationship) in one query: one row per player, or a single
+    # row with NULL player columns for a team without players
+    placeholders = ','.join('?' * len(team_ids))
+    
+    if normalized_sport:
+        cursor.execute(SQL_TEAMS_WITH_PLAYERS_BY_IDS_AND_SPORT.format(placeholders=placeholders), (*team_ids, sport_id))
+    else:
+        # Fallback if sport not provided (shouldn't happen due to API validation)
+        cursor.execute(SQL_TEAMS_WITH_PLAYERS_BY_IDS.format(placeholders=placeholders), tuple(team_ids))
+    
+    teams_data = []
+
+    # Process each matching team; columns 0-7 are the team, 8-16 the player
+    for _, team_rows in groupby(cursor, key=itemgetter(0)):
+        team_rows = list(team_rows)
+        result = team_rows[0]
+        team_filename = result[1].replace(" ", "_")
+        sport_lower = (result[7] or "").lower()
+        league_lower = (result[6] or "").lower()
+        team_folder = result[1].replace(" ", "_").lower()
+
+        players = []
+        for p_row in team_rows:
+            if p_row[8] is None:
+                continue
+            p_dict = {
+                "id": p_row[8],
+                "name": p_row[9],
+                "first_name": p_row[10],
+                "last_name": p_row[11],
+                "position": p_row[12],
+                "number": p_row[13],
+                "age": p_row[14],
+                "height": p_row[15],
+                "weight": p_row[16],
+            }
+            player_filename = (p_row[9] or "").replace(" ", "_").lower()
+            p_logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "players", sport_lower, league_lower, team_folder, f"{player_filename}.png")
+            p_dict["logo_url"] = f"/static/logo/players/{sport_lower}/{league_lower}/{team_folder}/{player_filename}.png" if os.path.exists(p_logo_path) else None
+            players.append(p_dict)
+
+        logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "teams", sport_lower, league_lower, f"{team_filename}.png")
+        logo_url = f"/static/logo/teams/{sport_lower}/{league_lower}/{team_filename}.png" if os.path.exists(logo_path) else None
+
+        teams_data.append({
+            "id": result[0],
+            "normalized_name": result[1],
+            "abbreviation": result[2],
+            "city": result[3],
+            "mascot": result[4],
+            "nickname": result[5],
+            "league": result[6],
+            "sport": result[7],
+            "logo_url": logo_url,
+            "players": players,
+            "player_count": len(players)
+        })
+    
+    if teams_data:
+        # Sort teams by league priority
+        teams_data.sort(key=lambda x: (get_league_priority(x.get("league", "")), x.get("normalized_name", "")))
         
-        if player:
-            normalized_player = normalize_key(player)
-            
-            # Search in BOTH player_aliases AND players table
-            # 1. Check player_aliases table
-            cursor.execute("""
-                SELECT DISTINCT player_id FROM player_aliases
-                WHERE LOWER(alias) = ?
-            """, (normalized_player,))
-            player_ids_from_aliases = [row[0] for row in cursor.fetchall()]
-            
-            # 2. Check players table directly (name, first_name, last_name)
-            # Try exact match first
-            cursor.execute("""
-                SELECT DISTINCT id FROM players
-                WHERE name = ? COLLATE NOCASE
-            """, (player.strip(),))
+        result_data = {
+            "type": "team",
+            "query": team,
+            "teams": teams_data,
+            "team_count": len(teams_data)
+        }
+        
+        # Cache the result
+        set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
+        return result_data
+
+    return _FALL_THROUGH
+
+
+def _lookup_player(
+    cursor: sqlite3.Cursor,
+    market: Optional[str],
+    team: Optional[str],
+    player: Optional[str],
+    sport: Optional[str],
+    league: Optional[str]
+) -> Any:
+    """Player lookup across all teams."""
+    normalized_player = normalize_key(player)
+    player_lc = _sqlite_lower(player)
+    
+    # Search in BOTH player_aliases AND players table
+    # 1. Check player_aliases table
+    cursor.execute(SQL_PLAYER_IDS_BY_ALIAS, (normalized_player,))
+    player_ids_from_aliases = [row[0] for row in cursor.fetchall()]
+    
+    # 2. Check players table directly (name, first_name, last_name)
+    # Try exact match first
+    cursor.execute(_search_sql(cursor.connection, SQL_PLAYER_IDS_BY_NAME), (player_lc, player_lc))
+    player_ids_from_main = [row[0] for row in cursor.fetchall()]
+    
+    if not player_ids_from_main and len(normalized_player) > 2:
+        like_pattern = f"%{normalized_player}%"
+        # A full-table scan: slow, but answers lookups nothing else can, so it
+        # is not cut off by the lookup's time budget
+        with _deadline_suspended():
+            cursor.execute(SQL_PLAYER_IDS_BY_SUBSTRING, (like_pattern, like_pattern, like_pattern))
             player_ids_from_main = [row[0] for row in cursor.fetchall()]
-            
-            if not player_ids_from_main and len(normalized_player) > 2:
-                cursor.execute("""
-                    SELECT DISTINCT id FROM players
-                    WHERE LOWER(name) LIKE ? OR LOWER(first_name) LIKE ? OR LOWER(last_name) LIKE ?
-                """, (f"%{normalized_player}%", f"%{normalized_player}%", f"%{normalized_player}%"))
-                player_ids_from_main = [row[0] for row in cursor.fetchall()]
-            
-            # Combine and deduplicate player IDs
-            player_ids = list(set(player_ids_from_aliases + player_ids_from_main))
-            
-            if not player_ids:
-                return None
-            
-            # Search for ALL players with matching player_id (case-insensitive)
-            placeholders = ','.join('?' * len(player_ids))
-            cursor.execute(f"""
-                SELECT p.id, p.name, p.first_name, p.last_name, p.position, p.number,
-                       p.age, p.height, p.weight,
-                       t.name as team_name, l.name as league_name, s.name as sport_name
-                FROM players p
-                LEFT JOIN teams t ON p.team_id = t.id
-                LEFT JOIN leagues l ON p.league_id = l.id
-                LEFT JOIN sports s ON p.sport_id = s.id
-                WHERE p.id IN ({placeholders})
-                ORDER BY p.name
-            """, tuple(player_ids))
-            
-            results = cursor.fetchall()
-            if results:
-                players_data = []
-                
-                for result in results:
-                    players_data.append({
-                        "id": result["id"],
-                        "normalized_name": result["name"],
-                        "first_name": result["first_name"],
-                        "last_name": result["last_name"],
-                        "position": result["position"],
-                        "number": result["number"],
-                        "age": result["age"],
-                        "height": result["height"],
-                        "weight": result["weight"],
-                        "team": result["team_name"],
-                        "league": result["league_name"],
-                        "sport": result["sport_name"]
-                    })
-                
-                # Sort players by league priority
-                players_data.sort(key=lambda x: (get_league_priority(x.get("league", "")), x.get("normalized_name", "")))
-                
-                result_data = {
-                    "type": "player",
-                    "query": player,
-                    "players": players_data,
-                    "player_count": len(players_data)
-                }
-                
-                # Cache the result
-                set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
-                return result_data
+    
+    # Combine and deduplicate player IDs
+    player_ids = list(set(player_ids_from_aliases + player_ids_from_main))
+    
+    if not player_ids:
+        return None
+    
+    # Search for ALL players with matching player_id (case-insensitive)
+    placeholders = ','.join('?' * len(player_ids))
+    cursor.execute(SQL_PLAYERS_BY_IDS.format(placeholders=placeholders), tuple(player_ids))
+    
+    results = cursor.fetchall()
+    if results:
+        players_data = []
         
-        if league:
-            normalized_league = normalize_key(league)
-            normalized_sport = normalize_key(sport) if sport else None
-            
-            # Search in BOTH league_aliases AND leagues table
-            # 1. Check league_aliases table
-            cursor.execute("""
-                SELECT DISTINCT league_id FROM league_aliases
-                WHERE LOWER(alias) = ?
-            """, (normalized_league,))
-            league_ids_from_aliases = [row[0] for row in cursor.fetchall()]
-            
-            # 2. Check leagues table directly
-            league_ids_from_main = []
-            
-            # Try exact match first
-            if normalized_sport:
-                cursor.execute("""
-                    SELECT DISTINCT l.id FROM leagues l
-                    LEFT JOIN sports s ON l.sport_id = s.id
-                    WHERE l.name = ? COLLATE NOCASE
-                      AND LOWER(s.name) = ?
-                """, (league.strip(), normalized_sport))
-            else:
-                cursor.execute("""
-                    SELECT DISTINCT id FROM leagues
-                    WHERE name = ? COLLATE NOCASE
-                """, (league.strip(),))
-            
-            league_ids_from_main = [row[0] for row in cursor.fetchall()]
-
-            if not league_ids_from_main:
-                if normalized_sport:
-                    cursor.execute("""
-                        SELECT DISTINCT l.id FROM leagues l
-                        LEFT JOIN sports s ON l.sport_id = s.id
-                        WHERE LOWER(l.name) LIKE ?
-                          AND LOWER(s.name) = ?
-                    """, (f"%{normalized_league}%", normalized_sport))
-                else:
-                    cursor.execute("""
-                        SELECT DISTINCT id FROM leagues
-                        WHERE LOWER(name) LIKE ?
-                    """, (f"%{normalized_league}%",))
-                
-                league_ids_from_main = [row[0] for row in cursor.fetchall()]
-            
-            # Combine and deduplicate league IDs
-            league_ids = list(set(league_ids_from_aliases + league_ids_from_main))
-            
-            if not league_ids:
-                return None
-            
-            # Search for ALL leagues matching league_id(s), filtered by sport if provided
-            placeholders = ','.join('?' * len(league_ids))
-            
-            if normalized_sport:
-                cursor.execute(f"""
-                    SELECT l.id, l.name, s.name as sport_name
-                    FROM leagues l
-                    LEFT JOIN sports s ON l.sport_id = s.id
-                    WHERE l.id IN ({placeholders})
-                      AND LOWER(s.name) = ?
-                    ORDER BY l.name
-                """, (*league_ids, normalized_sport))
-            else:
-                cursor.execute(f"""
-                    SELECT l.id, l.name, s.name as sport_name
-                    FROM leagues l
-                    LEFT JOIN sports s ON l.sport_id = s.id
-                    WHERE l.id IN ({placeholders})
-                    ORDER BY l.name
-                """, tuple(league_ids))
+        for result in results:
+            players_data.append({
+                "id": result["id"],
+                "normalized_name": result["name"],
+                "first_name": result["first_name"],
+                "last_name": result["last_name"],
+                "position": result["position"],
+                "number": result["number"],
+                "age": result["age"],
+                "height": result["height"],
+                "weight": result["weight"],
+                "team": result["team_name"],
+                "league": result["league_name"],
+                "sport": result["sport_name"]
+            })
+        
+        # Sort players by league priority
+        players_data.sort(key=lambda x: (get_league_priority(x.get("league", "")), x.get("normalized_name", "")))
+        
+        result_data = {
+            "type": "player",
+            "query": player,
+            "players": players_data,
+            "player_count": len(players_data)
+        }
+        
+        # Cache the result
+        set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
+        return result_data
+
+    return _FALL_THROUGH
+
+
+def _lookup_league(
+    cursor: sqlite3.Cursor,
+    market: Optional[str],
+    team: Optional[str],
+    player: Optional[str],
+    sport: Optional[str],
+    league: Optional[str]
+) -> Any:
+    """League lookup: every matching league with its teams."""
+    normalized_league = normalize_key(league)
+    normalized_sport = normalize_key(sport) if sport else None
+    
+    # Search in BOTH league_aliases AND leagues table
+    # 1. Check league_aliases table
+    cursor.execute(SQL_LEAGUE_IDS_BY_ALIAS, (normalized_league,))
+    league_ids_from_aliases = [row[0] for row in cursor.fetchall()]
+    
+    # 2. Check leagues table directly
+    league_ids_from_main = []
+    
+    # Try exact match first
+    if normalized_sport:
+        cursor.execute(SQL_LEAGUE_IDS_BY_NAME_AND_SPORT, (league.strip(), normalized_sport))
+    else:
+        cursor.execute(SQL_LEAGUE_IDS_BY_NAME, (league.strip(),))
+    
+    league_ids_from_main = [row[0] for row in cursor.fetchall()]
+
+    if not league_ids_from_main:
+        if normalized_sport:
+            cursor.execute(SQL_LEAGUE_IDS_BY_SUBSTRING_AND_SPORT, (f"%{normalized_league}%", normalized_sport))
+        else:
+            cursor.execute(SQL_LEAGUE_IDS_BY_SUBSTRING, (f"%{normalized_league}%",))
+        
+        league_ids_from_main = [row[0] for row in cursor.fetchall()]
+    
+    # Combine and deduplicate league IDs
+    league_ids = list(set(league_ids_from_aliases + league_ids_from_main))
+    
+    if not league_ids:
+        return None
+    
+    # Search for ALL leagues matching league_id(s), filtered by sport if provided
+    placeholders = ','.join('?' * len(league_ids))
+    
+    if normalized_sport:
+        cursor.execute(SQL_LEAGUES_BY_IDS_AND_SPORT.format(placeholders=placeholders), (*league_ids, normalized_sport))
+    else:
+        cursor.execute(SQL_LEAGUES_BY_IDS.format(placeholders=placeholders), tuple(league_ids))
+    
+    results = cursor.fetchall()
+    if results:
+        leagues_data = []
+        
+        # Process each matching league
+        for result in results:
+            league_id = result["id"]
             
-            results = cursor.fetchall()
-            if results:
-                leagues_data = []
-                
-                # Process each matching league
-                for result in results:
-                    league_id = result["id"]
-                    
-                    # Get all teams for this league (ONE-TO-MANY relationship)
-                    cursor.execute("""
-                        SELECT t.id, t.name, t.abbreviation, t.city, t.mascot, t.nickname
-                        FROM teams t
-                        WHERE t.league_id = ?
-                        ORDER BY t.name
-                    """, (league_id,))                    
-                    team_rows = cursor.fetchall()
-                    sport_lower = (result["sport_name"] or "").lower()
-                    league_lower = (result["name"] or "").lower()
-
-                    teams = []
-                    for t_row in team_rows:
-                        t_dict = dict(t_row)
-                        team_filename = (t_row["name"] or "").replace(" ", "_")
-                        t_logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "teams", sport_lower, league_lower, f"{team_filename}.png")
-                        t_dict["logo_url"] = f"/static/logo/teams/{sport_lower}/{league_lower}/{team_filename}.png" if os.path.exists(t_logo_path) else None
-                        teams.append(t_dict)
-
-                    league_logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "leagues", sport_lower, f"{result['name']}.png")
-                    league_logo_url = f"/static/logo/leagues/{sport_lower}/{result['name']}.png" if os.path.exists(league_logo_path) else None
-
-                    leagues_data.append({
-                        "id": result["id"],
-                        "normalized_name": result["name"],
-                        "sport": result["sport_name"],
-                        "logo_url": league_logo_url,
-                        "teams": teams,
-                        "team_count": len(teams)
-                    })
-                
-                # Sort leagues by priority
-                leagues_data.sort(key=lambda x: (get_league_priority(x.get("normalized_name", "")), x.get("normalized_name", "")))
-                
-                result_data = {
-                    "type": "league",
-                    "query": league,
-                    "leagues": leagues_data,
-                    "league_count": len(leagues_data)
-                }
-                
-                # Cache the result
-                set_cached_data(result_data, market=market, team=team, player=player, sport=sport, league=league)
-                return result_data
+            # Get all teams for this league (ONE-TO-MANY relationship)
+            cursor.execute(SQL_TEAMS_FOR_LEAGUE, (league_id,))
+            team_rows = cursor.fetchall()
+            sport_lower = (result["sport_name"] or "").lower()
+            league_lower = (result["name"] or "").lower()
+
+            teams = []
+            for t_row in team_rows:
+                t_dict = dict(t_row)
+                team_filename = (t_row["name"] or "").replace(" ", "_")
+                t_logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "teams", sport_lower, league_lower, f"{team_filename}.png")
+                t_dict["logo_url"] = f"/static/logo/teams/{sport_lower}/{league_lower}/{team_filename}.png" if os.path.exists(t_logo_path) else None
+                teams.append(t_dict)
+
+            league_logo_path = os.path.join(os.path.dirname(__file__), "static", "logo", "leagues", sport_lower, f"{result['name']}.png")
+            league_logo_url = f"/static/logo/leagues/{sport_lower}/{result['name']}.png" if os.path.exists(league_logo_path) else None
+
+            leagues_data.append({
+                "id": result["id"],
+                "normalized_name": result["name"],
+                "sport": result["sport_name"],
+                "logo_url": league_logo_url,
+                "teams": teams,
+                "team_count": len(teams)
+            })
         
-        if market:
-            normalized_market = normalize_key(market)
-            # Create a stripped version for robust matching (no spaces, no underscores)
-            market_search_term = market.lower().replace(" ", "").replace("_", "")
+        # Sort leagues by priority
+        leagues_data.sort(key=lambda x: (get_league_priority(x.get("normalized_name", "")), x.get("normalized_name", "")))
+        
+        result_data = {
+            "type": "league",
+            "query": league,
+            "leagues": leagues_data,
+            "league_count": len(leagues_data)
+        }
+        
+        # Cache the result
+        set_cached_data(result_data, market=market, team=team, player=player, sport=sport, league=league)
+        return result_data
+
+    return _FALL_THROUGH
+
+
+def _lookup_market(
+    cursor: sqlite3.Cursor,
+    market: Optional[str],
+    team: Optional[str],
+    player: Optional[str],
+    sport: Optional[str],
+    league: Optional[str]
+) -> Any:
+    """Market lookup, expanding abbreviated internal market names."""
+    normalized_market = normalize_key(market)
+    # Create a stripped version for robust matching (no spaces, no underscores)
+    market_search_term = market.lower().replace(" ", "").replace("_", "")
+
+    market_ids = []   # resolved market IDs (one or more)
+    is_exact = False  # True when resolved via an exact alias or name match
+
+    # Step 1: Try exact alias match
+    cursor.execute(SQL_MARKET_ID_BY_ALIAS, (market_search_term,))
+    alias_result = cursor.fetchone()
+
+    if alias_result:
+        market_ids = [alias_result[0]]
+        is_exact = True
+    else:
+        # Step 2: Try exact stripped match on markets table
+        cursor.execute(SQL_MARKET_ID_BY_NAME, (market_search_term,))
+        direct_result = cursor.fetchone()
 
-            market_ids = []   # resolved market IDs (one or more)
-            is_exact = False  # True when resolved via an exact alias or name match
+        if direct_result:
+            market_ids = [direct_result[0]]
+            is_exact = True
+        else:
+            # Step 3: Fuzzy prefix match — collect ALL matches, not just the first
+            normalized_input = market.lower().strip()
 
-            # Step 1: Try exact alias match
-            cursor.execute("""
-                SELECT DISTINCT market_id FROM market_aliases
-                WHERE LOWER(REPLACE(REPLACE(alias, ' ', ''), '_', '')) = ?
-                LIMIT 1
-            """, (market_search_term,))
-            alias_result = cursor.fetchone()
-
-            if alias_result:
-                market_ids = [alias_result[0]]
-                is_exact = True
+            cursor.execute(SQL_MARKET_IDS_BY_PREFIX, (f"{normalized_input}%",))
+            fuzzy_rows = cursor.fetchall()
+
+            if fuzzy_rows:
+                market_ids = [row[0] for row in fuzzy_rows]
             else:
-                # Step 2: Try exact stripped match on markets table
-                cursor.execute("""
-                    SELECT id FROM markets
-                    WHERE LOWER(REPLACE(REPLACE(name, ' ', ''), '_', '')) = ?
-                    LIMIT 1
-                """, (market_search_term,))
-                direct_result = cursor.fetchone()
-
-                if direct_result:
-                    market_ids = [direct_result[0]]
-                    is_exact = True
-                else:
-                    # Step 3: Fuzzy prefix match — collect ALL matches, not just the first
-                    normalized_input = market.lower().strip()
-
-                    cursor.execute("""
-                        SELECT id FROM markets
-                        WHERE LOWER(name) LIKE ?
-                        ORDER BY LENGTH(name) ASC, name ASC
-                    """, (f"{normalized_input}%",))
-                    fuzzy_rows = cursor.fetchall()
-
-                    if fuzzy_rows:
-                        market_ids = [row[0] for row in fuzzy_rows]
+                # Step 4: Expanded abbreviations (1h -> 1st half, yds -> yards, etc.)
+                expanded_input = expand_sports_terms(normalized_input)
+                if expanded_input != normalized_input:
+                    cursor.execute(SQL_MARKET_IDS_BY_PREFIX, (f"{expanded_input.replace('_', ' ')}%",))
+                    expanded_rows = cursor.fetchall()
+                    if expanded_rows:
+                        market_ids = [row[0] for row in expanded_rows]
                     else:
-                        # Step 4: Expanded abbreviations (1h -> 1st half, yds -> yards, etc.)
-                        expanded_input = expand_sports_terms(normalized_input)
-                        if expanded_input != normalized_input:
-                            cursor.execute("""
-                                SELECT id FROM markets
-                                WHERE LOWER(name) LIKE ?
-                                ORDER BY LENGTH(name) ASC, name ASC
-                            """, (f"{expanded_input.replace('_', ' ')}%",))
-                            expanded_rows = cursor.fetchall()
-                            if expanded_rows:
-                                market_ids = [row[0] for row in expanded_rows]
-                            else:
-                                return None
-                        else:
-                            return None
-
-            if not market_ids:
-                return None
-
-            # When we resolved to exactly one market via an exact match, check whether
-            # its normalized_name is itself an abbreviated/internal name (e.g. "total_1h").
-            # If so, expand it and return all matching canonical markets instead.
-            if is_exact and len(market_ids) == 1:
-                cursor.execute("SELECT name FROM markets WHERE id = ?", (market_ids[0],))
-                name_row = cursor.fetchone()
-                if name_row:
-                    matched_name = name_row[0]
-                    if expand_sports_terms(matched_name.lower()) != matched_name.lower():
-                        # Internal abbreviated name detected (e.g. "total_1h", "money_1h").
-                        # Split on "_", expand each token, then try every token ordering as a
-                        # prefix search.  This maps "total_1h" -> "1st half total%" precisely.
-                        parts = matched_name.lower().split("_")
-                        expanded_parts = [expand_sports_terms(p).strip() for p in parts]
-                        canonical_ids: List[str] = []
-                        if len(expanded_parts) <= 4:  # cap permutations (max 4! = 24)
-                            seen: set = set()
-                            for perm in _permutations(expanded_parts):
-                                prefix = " ".join(perm)
-                                cursor.execute(
-                                    "SELECT id FROM markets WHERE LOWER(name) LIKE ? ORDER BY name",
-                                    (f"{prefix}%",)
-                                )
-                                for row in cursor.fetchall():
-                                    if row[0] not in seen:
-                                        seen.add(row[0])
-                                        canonical_ids.append(row[0])
-                        if not canonical_ids:
-                            # Fall back: keyword-contains search across all expanded tokens
-                            keywords = [kw for kw in " ".join(expanded_parts).split() if len(kw) > 1]
-                            where_parts = " AND ".join(["LOWER(name) LIKE ?" for _ in keywords])
-                            params = [f"%{kw}%" for kw in keywords]
-                            cursor.execute(
-                                f"SELECT id FROM markets WHERE {where_parts} ORDER BY name",
-                                params
-                            )
-                            canonical_ids = [row[0] for row in cursor.fetchall()]
-                        if canonical_ids:
-                            market_ids = canonical_ids
-                            is_exact = False  # now treated as multi-match
-
-            # Fetch full details for all resolved market IDs
-            placeholders = ",".join("?" * len(market_ids))
-            cursor.execute(
-                f"SELECT id, name, market_type_id FROM markets WHERE id IN ({placeholders}) ORDER BY name",
-                market_ids
-            )
-            market_rows = cursor.fetchall()
-
-            if not market_rows:
-                return None
-
-            # Fetch sports for all resolved markets in one query
-            cursor.execute(
-                f"""SELECT ms.market_id, s.name
-                    FROM market_sports ms
-                    JOIN sports s ON ms.sport_id = s.id
-                    WHERE ms.market_id IN ({placeholders})""",
-                market_ids
-            )
-            sports_map: Dict[str, List[str]] = {}
-            for row in cursor.fetchall():
-                mid = row[0]
-                if mid not in sports_map:
-                    sports_map[mid] = []
-                sports_map[mid].append(row[1])
-
-            if len(market_rows) == 1:
-                # Single result — return existing single-market format (backward compatible)
-                result = market_rows[0]
-                result_data = {
-                    "type": "market",
-                    "query": market,
-                    "normalized_name": result["name"],
-                    "market_type_id": result["market_type_id"],
-                    "sports": sports_map.get(result["id"], [])
-                }
-                set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
-                return result_data
+                        return None
+                else:
+                    return None
 
-            # Multiple results — return all canonical matches
-            matches = [
-                {
-                    "normalized_name": row["name"],
-                    "market_type_id": row["market_type_id"],
-                    "sports": sports_map.get(row["id"], [])
-                }
-                for row in market_rows
-            ]
-            result_data = {
-                "type": "market",
-                "query": market,
-                "matches": matches
-            }
-            set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
-            return result_data
-        
-        # No match found
+    if not market_ids:
         return None
-        
-    finally:
-        cursor.close()
-        if should_close:
-            conn.close()
+
+    # When we resolved to exactly one market via an exact match, check whether
+    # its normalized_name is itself an abbreviated/internal name (e.g. "total_1h").
+    # If so, expand it and return all matching canonical markets instead.
+    if is_exact and len(market_ids) == 1:
+        cursor.execute(SQL_MARKET_NAME_BY_ID, (market_ids[0],))
+        name_row = cursor.fetchone()
+        if name_row:
+            matched_name = name_row[0]
+            if expand_sports_terms(matched_name.lower()) != matched_name.lower():
+                # Internal abbreviated name detected (e.g. "total_1h", "money_1h").
+                # Split on "_", expand each token, then try every token ordering as a
+                # prefix search.  This maps "total_1h" -> "1st half total%" precisely.
+                parts = matched_name.lower().split("_")
+                expanded_parts = [expand_sports_terms(p).strip() for p in parts]
+                canonical_ids: List[str] = []
+                if len(expanded_parts) <= 4:  # cap permutations (max 4! = 24)
+                    seen: set = set()
+                    for perm in _permutations(expanded_parts):
+                        prefix = " ".join(perm)
+                        cursor.execute(
+                            SQL_MARKET_IDS_BY_NAME_PREFIX,
+                            (f"{prefix}%",)
+                        )
+                        for row in cursor.fetchall():
+                            if row[0] not in seen:
+                                seen.add(row[0])
+                                canonical_ids.append(row[0])
+                if not canonical_ids:
+                    # Fall back: keyword-contains search across all expanded tokens
+                    keywords = [kw for kw in " ".join(expanded_parts).split() if len(kw) > 1]
+                    where_parts = " AND ".join(["LOWER(name) LIKE ?" for _ in keywords])
+                    params = [f"%{kw}%" for kw in keywords]
+                    cursor.execute(
+                        f"SELECT id FROM markets WHERE {where_parts} ORDER BY name",
+                        params
+                    )
+                    canonical_ids = [row[0] for row in cursor.fetchall()]
+                if canonical_ids:
+                    market_ids = canonical_ids
+                    is_exact = False  # now treated as multi-match
+
+    # Fetch full details and sports for all resolved market IDs in one query
+    placeholders = ",".join("?" * len(market_ids))
+    cursor.execute(
+        SQL_MARKETS_WITH_SPORTS_BY_IDS.format(placeholders=placeholders),
+        market_ids
+    )
+    market_rows = cursor.fetchall()
+
+    if not market_rows:
+        return None
+
+    if len(market_rows) == 1:
+        # Single result — return existing single-market format (backward compatible)
+        result = market_rows[0]
+        result_data = {
+            "type": "market",
+            "query": market,
+            "normalized_name": result["name"],
+            "market_type_id": result["market_type_id"],
+            "sports": _split_sports(result["sports"])
+        }
+        set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
+        return result_data
+
+    # Multiple results — return all canonical matches
+    matches = [
+        {
+            "normalized_name": row["name"],
+            "market_type_id": row["market_type_id"],
+            "sports": _split_sports(row["sports"])
+        }
+        for row in market_rows
+    ]
+    result_data = {
+        "type": "market",
+        "query": market,
+        "matches": matches
+    }
+    set_cached_data(result_data, market=market, team=team, player=player, sport=sport)
+    return result_data
+
+
+# Returned by a _lookup_* function that found ids but no rows, so the next
+# lookup in the chain gets a turn (None means "stop: no match").
+_FALL_THROUGH = object()
+
+# Lookup order for each (has_market, has_team, has_player, has_league) shape,
+# built once so get_cache_entry does not re-walk the priority chain per call.
+# team + player is a single combined lookup; otherwise team > player > league > market.
+_LOOKUP_CHAINS = {
+    (has_market, has_team, has_player, has_league): (
+        (_lookup_team_player,) if has_team and has_player else tuple(
+            lookup for present, lookup in (
+                (has_team, _lookup_team),
+                (has_player, _lookup_player),
+                (has_league, _lookup_league),
+                (has_market, _lookup_market),
+            ) if present
+        )
+    )
+    for has_market, has_team, has_player, has_league in _product((False, True), repeat=4)
+}
+
+
+def _iter_rows(cursor: sqlite3.Cursor, size: int = 1000):
+    """Yield rows in fetchmany batches so a full table is never held as one list."""
+    cursor.arraysize = size
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        yield from rows
 
 
 def get_all_teams() -> List[Dict[str, Any]]:
     """Get all teams from database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT t.id, t.name, t.abbreviation, l.name as league_name, s.name as sport_name
-            FROM teams t
-            LEFT JOIN leagues l ON t.league_id = l.id
-            LEFT JOIN sports s ON t.sport_id = s.id
-        """)
+    with borrow_connection() as conn:
+        cursor = conn.execute(SQL_ALL_TEAMS)
         
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        conn.close()
+        return [
+            {"id": r[0], "name": r[1], "abbreviation": r[2], "league_name": r[3], "sport_name": r[4]}
+            for r in _iter_rows(cursor)
+        ]
 
 
 def get_all_players() -> List[Dict[str, Any]]:
     """Get all players from database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT p.id, p.name, p.position, t.name as team_name, l.name as league_name, s.name as sport_name
-            FROM players p
-            LEFT JOIN teams t ON p.team_id = t.id
-            LEFT JOIN leagues l ON p.league_id = l.id
-            LEFT JOIN sports s ON p.sport_id = s.id
-        """)
+    with borrow_connection() as conn:
+        cursor = conn.execute(SQL_ALL_PLAYERS)
         
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        conn.close()
+        return [
+            {"id": r[0], "name": r[1], "position": r[2], "team_name": r[3], "league_name": r[4], "sport_name": r[5]}
+            for r in _iter_rows(cursor)
+        ]
 
 
-    try:
-        cursor.execute("""
-            SELECT m.id, m.name, m.market_type_id
-            FROM markets m
-        """)
+def get_all_markets() -> List[Dict[str, Any]]:
+    """Get all markets from database"""
+    with borrow_connection() as conn:
+        cursor = conn.execute(SQL_ALL_MARKETS)
         
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        conn.close()
+        return [{"id": r[0], "name": r[1], "market_type_id": r[2]} for r in _iter_rows(cursor)]
 
 
 def _chunk_list(lst, n):
@@ -1003,10 +1603,21 @@ def _resolve_batch_teams(conn: sqlite3.Connection, team_names: List[str], sport:
             """
             cursor = conn.execute(p_query, found_tids_actual)
             for p in cursor:
-                tid = p["team_id"]
+                tid = p[9]
                 if tid not in players_by_team:
                     players_by_team[tid] = []
-                players_by_team[tid].append(dict(p))
+                players_by_team[tid].append({
+                    "id": p[0],
+                    "name": p[1],
+                    "first_name": p[2],
+                    "last_name": p[3],
+                    "position": p[4],
+                    "number": p[5],
+                    "age": p[6],
+                    "height": p[7],
+                    "weight": p[8],
+                    "team_id": tid,
+                })
 
         # Build Team Objects
         for row in rows:
@@ -1277,33 +1888,20 @@ def _resolve_bulk_markets(conn: sqlite3.Connection, market_names: List[str]) ->
                             {mid for mids in found_multi.values() for mid in mids})
 
     market_detail_map: Dict[str, Dict] = {}
-    sports_map: Dict[str, List[str]]   = {}
 
     if all_relevant_ids:
         placeholders = ",".join("?" * len(all_relevant_ids))
         cursor = conn.execute(
-            f"SELECT id, name, market_type_id FROM markets WHERE id IN ({placeholders})",
+            SQL_MARKETS_WITH_SPORTS_BY_IDS.format(placeholders=placeholders),
             all_relevant_ids
         )
         for row in cursor.fetchall():
             market_detail_map[row["id"]] = {
                 "normalized_name": row["name"],
                 "market_type_id":  row["market_type_id"],
+                "sports":          _split_sports(row["sports"]),
             }
 
-        cursor = conn.execute(
-            f"""SELECT ms.market_id, s.name
-                FROM market_sports ms
-                JOIN sports s ON ms.sport_id = s.id
-                WHERE ms.market_id IN ({placeholders})""",
-            all_relevant_ids
-        )
-        for row in cursor:
-            mid = row[0]
-            if mid not in sports_map:
-                sports_map[mid] = []
-            sports_map[mid].append(row[1])
-
     # Build output
     for original in market_names:
         if original in found_single:
@@ -1315,7 +1913,7 @@ def _resolve_bulk_markets(conn: sqlite3.Connection, market_names: List[str]) ->
                     "query":           original,
                     "normalized_name": detail["normalized_name"],
                     "market_type_id":  detail["market_type_id"],
-                    "sports":          sports_map.get(mid, []),
+                    "sports":          detail["sports"],
                 }
             else:
                 results[original] = None
@@ -1327,7 +1925,7 @@ def _resolve_bulk_markets(conn: sqlite3.Connection, market_names: List[str]) ->
                 {
                     "normalized_name": market_detail_map[mid]["normalized_name"],
                     "market_type_id":  market_detail_map[mid]["market_type_id"],
-                    "sports":          sports_map.get(mid, []),
+                    "sports":          market_detail_map[mid]["sports"],
                 }
                 for mid in mids
                 if mid in market_detail_map
@@ -1401,46 +1999,44 @@ def get_batch_cache_entries(
     # Leagues usually match or don't, and are few.
     
     # 2. Bulk DB Resolve for Misses
-    conn = get_db_connection()
-    try:
-        if miss_teams:
-            team_results = _resolve_batch_teams(conn, miss_teams, sport)
-            for t, data in team_results.items():
-                result["team"][t] = data
-                if data:
-                    set_cached_data(data, team=t, sport=sport)
-
-        if miss_players:
-            player_results = _resolve_batch_players(conn, miss_players)
-            for p, data in player_results.items():
-                result["player"][p] = data
-                if data:
-                    set_cached_data(data, player=p)
-
-        if miss_markets:
-            market_results = _resolve_bulk_markets(conn, miss_markets)
-            for m, data in market_results.items():
-                result["market"][m] = data
-                if data:
-                    set_cached_data(data, market=m)
+    with borrow_connection() as conn:
+        try:
+            if miss_teams:
+                team_results = _resolve_batch_teams(conn, miss_teams, sport)
+                for t, data in team_results.items():
+                    result["team"][t] = data
+                    if data:
+                        set_cached_data(data, team=t, sport=sport)
+
+            if miss_players:
+                player_results = _resolve_batch_players(conn, miss_players)
+                for p, data in player_results.items():
+                    result["player"][p] = data
+                    if data:
+                        set_cached_data(data, player=p)
+
+            if miss_markets:
+                market_results = _resolve_bulk_markets(conn, miss_markets)
+                for m, data in market_results.items():
+                    result["market"][m] = data
+                    if data:
+                        set_cached_data(data, market=m)
         
-        # Legacy loop for Leagues
-        if leagues:
-            for l in leagues:
-                # Check Redis
-                cached = get_cached_data(league=l, sport=sport)
-                if cached:
-                     result["league"][l] = cached
-                else:
-                    # DB
-                    entry = get_cache_entry(league=l, sport=sport, active_connection=conn)
-                    result["league"][l] = entry
-                    # save cache done inside get_cache_entry
+            # Legacy loop for Leagues
+            if leagues:
+                for l in leagues:
+                    # Check Redis
+                    cached = get_cached_data(league=l, sport=sport)
+                    if cached:
+                         result["league"][l] = cached
+                    else:
+                        # DB
+                        entry = get_cache_entry(league=l, sport=sport, active_connection=conn)
+                        result["league"][l] = entry
+                        # save cache done inside get_cache_entry
                     
-    except Exception as e:
-        print(f"Batch Error: {e}")
-    finally:
-        conn.close()
+        except Exception as e:
+            print(f"Batch Error: {e}")
     
     return result
 
@@ -1454,9 +2050,7 @@ def get_precision_batch_cache_entries(queries: List[Dict[str, Any]]) -> Dict[str
     successful = 0
     failed = 0
     
-    conn = get_db_connection()
-    
-    try:
+    with borrow_connection() as conn:
         for idx, query_item in enumerate(queries):
             # Convert Pydantic model to dict if needed
             if hasattr(query_item, 'model_dump'):
@@ -1496,9 +2090,6 @@ def get_precision_batch_cache_entries(queries: List[Dict[str, Any]]) -> Dict[str
                     "data": None,
                     "error": str(e)
                 })
-                
-    finally:
-        conn.close()
     
     return {
         "results": results_list,
@@ -1526,14 +2117,7 @@ def get_all_leagues(
     Returns:
         Dictionary with leagues data and metadata
     """
-    if active_connection:
-        conn = active_connection
-        should_close = False
-    else:
-        conn = get_db_connection()
-        should_close = True
-    
-    try:
+    with (nullcontext(active_connection) if active_connection else borrow_connection()) as conn:
         cursor = conn.cursor()
         
         # Build query with filters
@@ -1613,9 +2197,3 @@ def get_all_leagues(
                 "region": region
             }
         }
-        
-    finally:
-        if should_close:
-            conn.close()
-
-
@@ -9,17 +9,19 @@ from fastapi import FastAPI, Query, HTTPException, Body, Security, Depends, Requ
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.concurrency import run_in_threadpool
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field, field_validator, model_validator
 import hmac
+import orjson
 import uvicorn
 import os
 import platform
+import sqlite3
 import time
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from dotenv import load_dotenv
 
 # Load environment variables early so that imported modules can
@@ -107,7 +109,7 @@ if platform.system() == "Windows" and not os.getenv('REDIS_HOST'):
     os.environ['REDIS_PORT'] = os.getenv('REDIS_PORT', '6379')
     print("[INFO] Detected Windows local environment; configuring Redis host to localhost:6379")
 
-from cache_db import get_cache_entry, get_batch_cache_entries, get_precision_batch_cache_entries, get_all_leagues
+from cache_db import get_cache_entry, get_batch_cache_entries, get_precision_batch_cache_entries, get_all_leagues, close_pool, check_search_columns, clear_local_cache, load_sport_ids, run_in_db_executor, QUERY_TIMEOUT, normalize_key, LOCAL_CACHE_TTL
 from redis_cache import get_cache_stats, clear_all_cache, invalidate_cache
 import uuid
 import json
@@ -263,8 +265,76 @@ async def lifespan(app: FastAPI):
         ensure_redis_container()
     # Seed env-var tokens into the managed token store (idempotent)
     await run_in_threadpool(request_tracking.seed_env_tokens, ADMIN_KEY, NON_ADMIN_KEY)
+    # Team/player lookups use indexed lowercase search columns once the database has been migrated
+    try:
+        if not await run_in_db_executor(check_search_columns):
+            print("[WARN] sports_data.db has no search columns; team/player lookups use unindexed queries "
+                  "until python migrate_search_columns.py is run and the database is committed")
+    except Exception as e:
+        print(f"[WARN] sports_data.db search column check failed: {e}")
+    # Cache the small sports table so team lookups can filter on sport_id
+    try:
+        await run_in_db_executor(load_sport_ids)
+    except Exception as e:
+        print(f"[WARN] sports_data.db sport id load failed: {e}")
     yield
-    # Shutdown: nothing to tear down (Redis is external)
+    # Shutdown: stop the SQLite executor and release pooled connections (Redis is external)
+    close_pool()
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse serialized with orjson (non-string keys allowed, as with json.dumps)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Serialized /cache bodies for repeat plain lookups (no include_stats / live).
+# Keyed on the raw query values because the body echoes them back. Entries
+# share LOCAL_CACHE_TTL with the cache_db lookup LRU. Only touched from
+# async handlers on the event loop, so no lock is needed.
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 8192))
+
+_response_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+def _response_cache_get(key: tuple) -> Optional[bytes]:
+    """Return the cached /cache body for key if it has not expired."""
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, body = entry
+    if expires_at < time.monotonic():
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return body
+
+
+def _response_cache_put(key: tuple, body: bytes):
+    """Store a /cache body, evicting the least recently used entry when full."""
+    if RESPONSE_CACHE_SIZE <= 0:
+        return
+    _response_cache[key] = (time.monotonic() + LOCAL_CACHE_TTL, body)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+def clear_response_cache(
+    market: Optional[str] = None,
+    team: Optional[str] = None,
+    player: Optional[str] = None,
+    sport: Optional[str] = None,
+    league: Optional[str] = None
+):
+    """Drop cached /cache bodies: all of them, or those matching one query in any casing."""
+    if not any([market, team, player, sport, league]):
+        _response_cache.clear()
+        return
+    target = tuple(normalize_key(v) for v in (market, team, player, sport, league))
+    for key in [k for k in _response_cache if tuple(normalize_key(v) for v in k) == target]:
+        del _response_cache[key]
+
 
 app = FastAPI(
     title="Cache API",
@@ -274,6 +344,7 @@ app = FastAPI(
     redoc_url=None,
     openapi_url=None,
     lifespan=lifespan,
+    default_response_class=OrjsonResponse,
 )
 
 # Mount static files for dashboard
@@ -499,7 +570,7 @@ async def health_check(token: str = Depends(verify_admin_token)):
 async def cache_statistics(token: str = Depends(verify_admin_token)):
     """Get detailed cache statistics (requires admin authentication)"""
     stats = get_cache_stats()
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=200,
         content=stats
     )
@@ -507,10 +578,12 @@ async def cache_statistics(token: str = Depends(verify_admin_token)):
 @app.delete("/cache/clear", tags=["admin"])
 async def clear_cache(token: str = Depends(verify_admin_token)):
     """Clear all cache entries (requires admin authentication)"""
+    clear_response_cache()
+    clear_local_cache()
     success = clear_all_cache()
     
     if success:
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=200,
             content={
                 "status": "success",
@@ -539,10 +612,12 @@ async def invalidate_specific_cache(
             detail="At least one parameter must be provided"
         )
     
+    clear_response_cache(market=market, team=team, player=player, sport=sport, league=league)
+    clear_local_cache(market=market, team=team, player=player, sport=sport, league=league)
     success = invalidate_cache(market=market, team=team, player=player, sport=sport, league=league)
     
     if success:
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=200,
             content={
                 "status": "success",
@@ -550,7 +625,7 @@ async def invalidate_specific_cache(
             }
         )
     else:
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=404,
             content={
                 "status": "not_found",
@@ -570,7 +645,7 @@ async def get_cache(
     live: bool = Query(False, description="Return live/pregame game state for the queried team or player (requires STATS_API_URL). When used alone with sport, returns all live games for that sport."),
     token: str = Depends(verify_token),
     _: None = Depends(verify_rate_limit)
-) -> JSONResponse:
+) -> OrjsonResponse:
     """
     Get normalized cache entry for market, team, player, or league (requires authentication).
     
@@ -611,7 +686,7 @@ async def get_cache(
         except Exception as exc:
             print(f"[WARN] /cache live-only fetch failed: {exc}")
             raise HTTPException(status_code=503, detail="Live stats service unavailable")
-        return JSONResponse(status_code=200, content={
+        return OrjsonResponse(status_code=200, content={
             "found": True,
             "live_data": live_result,
             "query": {"sport": sport, "live": True},
@@ -636,15 +711,24 @@ async def get_cache(
             detail="Sport parameter is required when searching by league"
         )
     
+    # Repeat plain lookups are served straight from the serialized body
+    response_key = None
+    if not include_stats and not live:
+        response_key = (market, team, player, sport, league)
+        body = _response_cache_get(response_key)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+    
     # Get the cache entry
     try:
-        result = await run_in_threadpool(
+        result = await run_in_db_executor(
             get_cache_entry,
             market=market, 
             team=team, 
             player=player, 
             sport=sport, 
-            league=league
+            league=league,
+            timeout=QUERY_TIMEOUT
         )
         
         if result is None:
@@ -693,7 +777,7 @@ async def get_cache(
                         request_group_id=request_group_id,
                         body_data=cache_body
                     )
-            return JSONResponse(
+            return OrjsonResponse(
                 status_code=404,
                 content={
                     "found": False,
@@ -752,8 +836,17 @@ async def get_cache(
         elif live and _sports_bridge is None:
             response_content["live_data_unavailable"] = True
 
-        return JSONResponse(status_code=200, content=response_content)
+        response = OrjsonResponse(status_code=200, content=response_content)
+        if response_key is not None:
+            _response_cache_put(response_key, response.body)
+        return response
         
+    except sqlite3.OperationalError as e:
+        if str(e) == "interrupted":
+            # The lookup ran past QUERY_TIMEOUT; fail fast and free the pool slot
+            raise HTTPException(status_code=504, detail="Cache lookup timed out")
+        print(f"[ERROR] GET /cache: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
     except Exception as e:
         print(f"[ERROR] GET /cache: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -771,7 +864,7 @@ async def check_event_market(
     line: Optional[float] = Query(None, description="Optional custom line; if omitted, stored line is used"),
     token: str = Depends(verify_token),
     _: None = Depends(verify_rate_limit),
-) -> JSONResponse:
+) -> OrjsonResponse:
     if not event_id and not (date and team and opponent):
         raise HTTPException(
             status_code=400,
@@ -792,7 +885,7 @@ async def check_event_market(
             pick=pick,
             line=line,
         )
-        return JSONResponse(status_code=200, content=result)
+        return OrjsonResponse(status_code=200, content=result)
     except Exception as exc:
         status_code = getattr(exc, "status_code", None)
         if status_code is not None:
@@ -810,7 +903,7 @@ async def get_live_games(
     status: Optional[str] = Query(None, description="Filter by game status: 'live' (in-progress only) or 'pregame' (upcoming only). Omit for both."),
     token: str = Depends(verify_token),
     _: None = Depends(verify_rate_limit),
-) -> JSONResponse:
+) -> OrjsonResponse:
     """
     Return current live and/or pregame matches tracked by the realtime monitor.
 
@@ -844,7 +937,7 @@ async def get_live_games(
     elif status == "pregame":
         result = {**result, "live": [], "live_count": 0}
 
-    return JSONResponse(status_code=200, content={
+    return OrjsonResponse(status_code=200, content={
         "found": result["live_count"] > 0 or result["pregame_count"] > 0,
         "live_count":    result["live_count"],
         "pregame_count": result["pregame_count"],
@@ -866,7 +959,7 @@ async def get_batch_cache(
     request_body: BatchQueryRequest = Body(...),
     token: str = Depends(verify_token),
     _: None = Depends(verify_rate_limit)
-) -> JSONResponse:
+) -> OrjsonResponse:
     """
     Batch cache query endpoint - independent searches for multiple items per category (requires authentication).
     
@@ -905,7 +998,7 @@ async def get_batch_cache(
     }
     """
     try:
-        result = await run_in_threadpool(
+        result = await run_in_db_executor(
             get_batch_cache_entries,
             teams=request_body.team,
             players=request_body.player,
@@ -972,7 +1065,7 @@ async def get_batch_cache(
                             body_data=batch_body
                         )
 
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=200,
             content=result
         )
@@ -987,7 +1080,7 @@ async def get_precision_batch_cache(
     request_body: PrecisionBatchRequest = Body(...),
     token: str = Depends(verify_token),
     _: None = Depends(verify_rate_limit)
-) -> JSONResponse:
+) -> OrjsonResponse:
     """
     Precision batch cache query endpoint - combined parameter searches in batch (requires authentication).
     
@@ -1041,9 +1134,9 @@ async def get_precision_batch_cache(
     """
     try:
         query_dicts = [query.model_dump(exclude_none=True) for query in request_body.queries]
-        result = await run_in_threadpool(get_precision_batch_cache_entries, query_dicts)
+        result = await run_in_db_executor(get_precision_batch_cache_entries, query_dicts)
         
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=200,
             content=result
         )
@@ -1061,7 +1154,7 @@ async def get_leagues(
     region: Optional[str] = Query(None, description="Filter by region (e.g., 'Europe', 'North America')"),
     token: str = Depends(verify_token),
     _: None = Depends(verify_rate_limit)
-) -> JSONResponse:
+) -> OrjsonResponse:
     """
     Get all leagues with optional filtering (requires authentication).
     
@@ -1081,14 +1174,14 @@ async def get_leagues(
     - /leagues?search=NBA
     """
     try:
-        result = await run_in_threadpool(
+        result = await run_in_db_executor(
             get_all_leagues,
             sport=sport,
             search=search,
             region=region
         )
         
-        return JSONResponse(
+        return OrjsonResponse(
             status_code=200,
             content=result
         )
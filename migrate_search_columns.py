@@ -0,0 +1,25 @@
+"""
+One-off migration: add the indexed lowercase search columns to sports_data.db.
+
+The app never migrates at startup. It only checks for these columns, and
+until they exist it uses unindexed fallback queries. So run this once against
+the database and commit the result through Git LFS:
+
+    python migrate_search_columns.py
+    git add sports_data.db && git commit -m "Add search columns to sports_data.db"
+"""
+
+from cache_db import DB_PATH, close_pool, init_search_columns
+
+
+def main():
+    print(f"Migrating {DB_PATH} ...")
+    try:
+        init_search_columns()
+    finally:
+        close_pool()
+    print("Search columns and indexes are up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -75,6 +75,16 @@ def mock_db_and_cleanup():
     _redis_none_patcher.stop()
 
 
+@pytest.fixture(autouse=True)
+def fresh_response_cache():
+    """Tests patch get_cache_entry per test, so don't replay another test's /cache body."""
+    import main
+
+    main.clear_response_cache()
+    yield
+    main.clear_response_cache()
+
+
 def user_headers():
     return {"Authorization": f"Bearer {USER_TOKEN}"}
 
@@ -265,6 +275,32 @@ class TestResponseShapes:
         except Exception:
             pytest.fail("Batch response was not valid JSON")
 
+    def test_repeat_cache_query_is_served_from_response_cache(self):
+        found = {"type": "market", "normalized_name": "Moneyline"}
+        with patch("main.get_cache_entry", return_value=found) as lookup:
+            first = CLIENT.get("/cache", params={"market": "Moneyline"}, headers=user_headers())
+            second = CLIENT.get("/cache", params={"market": "Moneyline"}, headers=user_headers())
+            other_case = CLIENT.get("/cache", params={"market": "moneyline"}, headers=user_headers())
+        assert first.status_code == second.status_code == 200
+        assert second.content == first.content
+        assert other_case.json()["query"]["market"] == "moneyline"
+        assert lookup.call_count == 2
+
+    def test_response_cache_cleared_by_invalidate(self):
+        found = {"type": "market", "normalized_name": "Moneyline"}
+        with patch("main.get_cache_entry", return_value=found) as lookup, patch("main.invalidate_cache", return_value=True):
+            CLIENT.get("/cache", params={"market": "Moneyline"}, headers=user_headers())
+            CLIENT.delete("/cache/invalidate", params={"market": "moneyline"}, headers=admin_headers())
+            CLIENT.get("/cache", params={"market": "Moneyline"}, headers=user_headers())
+        assert lookup.call_count == 2
+
+    def test_orjson_response_matches_json_dumps(self):
+        import json
+        from main import OrjsonResponse
+        content = {"name": "Zürich", "count": 2, "ids": [1, None], 404: True}
+        body = OrjsonResponse(content=content).body
+        assert json.loads(body) == json.loads(json.dumps(content))
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # /cache/batch/precision
@@ -598,6 +634,13 @@ class TestSourceFileSafety:
         assert "git lfs pull origin \"$DEPLOY_BRANCH\"" in content
         assert "git lfs install --local" in content
 
+    def test_only_the_sqlite_backed_cache_db_is_importable(self):
+        import cache_db
+
+        assert [p.name for p in Path(".").rglob("cache_db.py") if "site-packages" not in p.parts] == ["cache_db.py"]
+        assert Path(cache_db.__file__).resolve() == Path("cache_db.py").resolve()
+        assert not hasattr(cache_db, "PLACEHOLDER_CACHE")
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Source file coverage snapshot — fails when new functions/endpoints are added
@@ -645,9 +688,16 @@ KNOWN_ENDPOINTS = {
 }
 
 KNOWN_CACHE_DB_FUNCTIONS = {
-    "get_db_connection", "normalize_key", "get_league_priority",
-    "expand_sports_terms", "get_cache_entry", "get_all_teams",
-    "get_all_players", "_chunk_list", "_resolve_batch_teams",
+    "_create_connection", "_past_deadline", "query_deadline", "_deadline_suspended", "borrow_connection",
+    "_get_executor", "run_in_db_executor", "close_pool", "init_search_columns",
+    "check_search_columns", "_search_sql",
+    "_prefix_range", "_sqlite_lower", "_split_sports",
+    "_local_cache_key", "_local_cache_get", "_local_cache_put", "clear_local_cache",
+    "load_sport_ids", "_sport_id",
+    "normalize_key", "get_league_priority",
+    "expand_sports_terms", "get_cache_entry", "_query_cache_entry",
+    "_lookup_team_player", "_lookup_team", "_lookup_player", "_lookup_league", "_lookup_market",
+    "_iter_rows", "get_all_teams", "get_all_players", "get_all_markets", "_chunk_list", "_resolve_batch_teams",
     "_resolve_batch_players", "_resolve_bulk_markets",
     "get_batch_cache_entries", "get_precision_batch_cache_entries",
     "get_all_leagues",
@@ -1537,3 +1587,405 @@ class TestSourceFileCoverage:
         if not Path("deploy.sh").exists():
             pytest.skip("deploy.sh not present")
         self._assert_snapshot("deploy.sh variables", _scan_deploy_vars("deploy.sh"), KNOWN_DEPLOY_SH_VARS)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# cache_db query layer — runs against a tiny throwaway sports_data.db
+# ─────────────────────────────────────────────────────────────────────────────
+
+import sqlite3
+import orjson
+import cache_db
+
+_SPORTS_SCHEMA = """
+    CREATE TABLE sports (id TEXT PRIMARY KEY, name TEXT);
+    CREATE TABLE leagues (id TEXT PRIMARY KEY, name TEXT, numerical_id INTEGER, sport_id TEXT,
+                          region TEXT, region_code TEXT, gender TEXT, logo TEXT);
+    CREATE TABLE teams (id TEXT PRIMARY KEY, name TEXT, abbreviation TEXT, city TEXT, mascot TEXT,
+                        nickname TEXT, league_id TEXT, sport_id TEXT);
+    CREATE TABLE players (id TEXT PRIMARY KEY, name TEXT, first_name TEXT, last_name TEXT, position TEXT,
+                          number INTEGER, age INTEGER, height TEXT, weight TEXT,
+                          team_id TEXT, league_id TEXT, sport_id TEXT);
+    CREATE TABLE team_aliases (team_id TEXT, alias TEXT);
+    CREATE TABLE player_aliases (player_id TEXT, alias TEXT);
+    CREATE TABLE league_aliases (league_id TEXT, alias TEXT);
+    CREATE TABLE markets (id TEXT PRIMARY KEY, name TEXT, market_type_id INTEGER);
+    CREATE TABLE market_aliases (market_id TEXT, alias TEXT);
+    CREATE TABLE market_sports (market_id TEXT, sport_id TEXT);
+
+    INSERT INTO sports VALUES ('s1', 'Basketball'), ('s2', 'Soccer');
+    INSERT INTO leagues VALUES ('l1', 'NBA', 1, 's1', 'USA', 'US', 'male', NULL),
+                               ('l2', 'Premier League', 2, 's2', 'England', 'GB', 'male', NULL);
+    INSERT INTO teams VALUES ('t1', 'Los Angeles Lakers', 'LAL', 'Los Angeles', NULL, 'Lakers', 'l1', 's1'),
+                             ('t2', 'Los Angeles Clippers', 'LAC', 'Los Angeles', NULL, 'Clippers', 'l1', 's1'),
+                             ('t3', 'Arsenal', 'ARS', 'London', NULL, 'Gunners', 'l2', 's2');
+    INSERT INTO players VALUES ('p1', 'LeBron James', 'LeBron', 'James', 'F', 23, 39, NULL, NULL, 't1', 'l1', 's1'),
+                               ('p2', 'Anthony Davis', 'Anthony', 'Davis', 'C', 3, 31, NULL, NULL, 't1', 'l1', 's1'),
+                               ('p3', 'James Harden', 'James', 'Harden', 'G', 1, 35, NULL, NULL, 't2', 'l1', 's1'),
+                               ('p4', 'Bukayo Saka', 'Bukayo', 'Saka', 'RW', 7, 23, NULL, NULL, 't3', 'l2', 's2');
+    INSERT INTO team_aliases VALUES ('t1', 'la lakers');
+    INSERT INTO player_aliases VALUES ('p1', 'king james');
+    INSERT INTO markets VALUES ('m1', 'Moneyline', 1), ('m2', 'Spread', 2);
+    INSERT INTO market_sports VALUES ('m1', 's1'), ('m1', 's2'), ('m2', 's1');
+"""
+
+
+@pytest.fixture
+def sports_db(tmp_path, monkeypatch):
+    """Point cache_db at a freshly seeded sports database."""
+    db_path = tmp_path / "sports_data.db"
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SPORTS_SCHEMA)
+    conn.commit()
+    conn.close()
+    cache_db.close_pool()
+    cache_db.clear_local_cache()
+    monkeypatch.setattr(cache_db, "DB_PATH", str(db_path))
+    cache_db.init_search_columns()
+    yield db_path
+    cache_db.close_pool()
+    cache_db.clear_local_cache()
+
+
+class TestCacheDbQueries:
+    def test_team_lookup_returns_players_per_team(self, sports_db):
+        data = cache_db.get_cache_entry(team="Los Angeles", sport="Basketball")
+        assert data["type"] == "team"
+        players_by_team = {t["normalized_name"]: [p["name"] for p in t["players"]] for t in data["teams"]}
+        assert players_by_team == {
+            "Los Angeles Clippers": ["James Harden"],
+            "Los Angeles Lakers": ["Anthony Davis", "LeBron James"],
+        }
+
+    def test_team_lookup_player_shape_has_no_join_columns(self, sports_db):
+        data = cache_db.get_cache_entry(team="LAL", sport="Basketball")
+        player = data["teams"][0]["players"][0]
+        assert "team_id" not in player
+        assert {"id", "name", "first_name", "last_name", "logo_url"} <= set(player)
+        assert data["teams"][0]["player_count"] == 2
+
+    def test_team_and_player_lookup_matches_team_prefix(self, sports_db):
+        data = cache_db.get_cache_entry(team="los ang", player="LeBron James", sport="Basketball")
+        assert [p["team"] for p in data["players"]] == ["Los Angeles Lakers"]
+        assert cache_db.get_cache_entry(team="angeles", player="LeBron James", sport="Basketball") is None
+
+    def test_sport_ids_load_lazily_and_reset_on_clear(self, sports_db):
+        assert cache_db.SPORT_ID_BY_NAME is None
+        cache_db.get_cache_entry(team="Arsenal", sport="Soccer")
+        assert cache_db.SPORT_ID_BY_NAME == {"basketball": "s1", "soccer": "s2"}
+        cache_db.clear_local_cache()
+        assert cache_db.SPORT_ID_BY_NAME is None
+
+    def test_unknown_sport_returns_none_without_team_queries(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            statements = []
+            conn.set_trace_callback(statements.append)
+            try:
+                assert cache_db.get_cache_entry(team="Arsenal", sport="Curling", active_connection=conn) is None
+            finally:
+                conn.set_trace_callback(None)
+        assert not any("FROM teams" in sql for sql in statements)
+
+    def test_team_lookup_includes_team_without_players(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            conn.execute("INSERT INTO teams (id, name, abbreviation, nickname, league_id, sport_id) "
+                         "VALUES ('t9', 'Los Angeles Sparks', 'LAS', 'Sparks', 'l1', 's1')")
+            conn.commit()
+        data = cache_db.get_cache_entry(team="Los Angeles", sport="Basketball")
+        players = {t["normalized_name"]: t["players"] for t in data["teams"]}
+        assert players["Los Angeles Sparks"] == []
+        assert data["team_count"] == 3
+
+    def test_team_lookup_wrong_sport_returns_none(self, sports_db):
+        assert cache_db.get_cache_entry(team="Arsenal", sport="Basketball") is None
+
+    def test_player_lookup_by_alias(self, sports_db):
+        data = cache_db.get_cache_entry(player="King James")
+        assert [p["normalized_name"] for p in data["players"]] == ["LeBron James"]
+
+    def test_market_lookup_returns_sports(self, sports_db):
+        data = cache_db.get_cache_entry(market="moneyline")
+        assert data["normalized_name"] == "Moneyline"
+        assert sorted(data["sports"]) == ["Basketball", "Soccer"]
+
+    def test_team_prefix_lookup_is_case_insensitive(self, sports_db):
+        data = cache_db.get_cache_entry(team="GUNN", sport="Soccer")
+        assert [t["normalized_name"] for t in data["teams"]] == ["Arsenal"]
+
+    def test_player_exact_lookup_matches_full_name(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            conn.execute("INSERT INTO players (id, name, first_name, last_name, team_id, league_id, sport_id) "
+                         "VALUES ('p9', 'Shaq', 'Shaquille', 'O''Neal', 't1', 'l1', 's1')")
+            conn.commit()
+        data = cache_db.get_cache_entry(player="shaquille o'neal")
+        assert [p["normalized_name"] for p in data["players"]] == ["Shaq"]
+
+    def test_team_prefix_ending_before_surrogates_does_not_crash(self, sports_db):
+        assert cache_db.get_cache_entry(team="ars\ud7ff", sport="Soccer") is None
+
+    def test_team_exact_lookup_with_non_ascii_name(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            conn.execute("INSERT INTO teams (id, name, abbreviation, league_id, sport_id) "
+                         "VALUES ('t8', 'Örebro SK', 'ÖSK', 'l2', 's2')")
+            conn.commit()
+        data = cache_db.get_cache_entry(team="ÖREBRO sk", sport="Soccer")
+        assert [t["normalized_name"] for t in data["teams"]] == ["Örebro SK"]
+
+    def test_market_without_sports_returns_empty_list(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            conn.execute("INSERT INTO markets VALUES ('m3', 'Player Props', 3)")
+            conn.commit()
+        data = cache_db.get_cache_entry(market="player props")
+        assert data["normalized_name"] == "Player Props"
+        assert data["sports"] == []
+
+    def test_batch_markets_include_sports(self, sports_db):
+        data = cache_db.get_batch_cache_entries(markets=["Spread"])
+        assert data["market"]["Spread"]["sports"] == ["Basketball"]
+
+    def test_get_all_markets(self, sports_db):
+        names = sorted(m["name"] for m in cache_db.get_all_markets())
+        assert names == ["Moneyline", "Spread"]
+
+    def test_lookup_chains_follow_priority_order(self):
+        chains = cache_db._LOOKUP_CHAINS
+        assert chains[(True, True, True, True)] == (cache_db._lookup_team_player,)
+        assert chains[(True, True, False, True)] == (cache_db._lookup_team, cache_db._lookup_league, cache_db._lookup_market)
+        assert chains[(False, False, False, False)] == ()
+
+    def test_team_lookup_without_rows_falls_through_to_market(self, sports_db):
+        # "lakers" resolves to a team id, but not one in Soccer, so the market lookup answers
+        data = cache_db.get_cache_entry(market="Spread", team="la lakers", sport="Soccer")
+        assert data["type"] == "market" and data["normalized_name"] == "Spread"
+
+    def test_team_lookup_with_unknown_sport_falls_through_to_market(self, sports_db):
+        data = cache_db.get_cache_entry(market="Spread", team="la lakers", sport="Curling")
+        assert data["type"] == "market" and data["normalized_name"] == "Spread"
+
+    def test_iter_rows_streams_in_batches(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            cursor = conn.execute("SELECT id FROM players ORDER BY id")
+            assert [r[0] for r in cache_db._iter_rows(cursor, size=3)] == ["p1", "p2", "p3", "p4"]
+            assert cursor.arraysize == 3
+
+    def test_get_all_teams_and_players_row_shape(self, sports_db):
+        teams = {t["id"]: t for t in cache_db.get_all_teams()}
+        assert teams["t3"] == {"id": "t3", "name": "Arsenal", "abbreviation": "ARS",
+                               "league_name": "Premier League", "sport_name": "Soccer"}
+        players = {p["id"]: p for p in cache_db.get_all_players()}
+        assert players["p4"]["team_name"] == "Arsenal"
+        assert set(players["p4"]) == {"id", "name", "position", "team_name", "league_name", "sport_name"}
+
+
+class TestConnectionPool:
+    def test_connection_is_reused_across_borrows(self, sports_db):
+        with cache_db.borrow_connection() as first:
+            pass
+        with cache_db.borrow_connection() as second:
+            pass
+        assert first is second
+
+    def test_nested_borrows_get_distinct_connections(self, sports_db):
+        with cache_db.borrow_connection() as outer:
+            with cache_db.borrow_connection() as inner:
+                assert outer is not inner
+
+    def test_connection_returned_after_error(self, sports_db):
+        with pytest.raises(sqlite3.OperationalError):
+            with cache_db.borrow_connection() as conn:
+                conn.execute("SELECT * FROM no_such_table")
+        assert cache_db._pool.qsize() == 1
+
+    def test_pool_connections_use_wal_and_tuned_cache(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+
+    def test_query_deadline_interrupts_long_statement(self, sports_db):
+        slow = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+        with cache_db.borrow_connection() as conn:
+            with pytest.raises(sqlite3.OperationalError, match="interrupted"):
+                with cache_db.query_deadline(0.01):
+                    conn.execute(slow).fetchone()
+            # The deadline is gone once the block exits
+            assert conn.execute("SELECT 1").fetchone()[0] == 1
+
+    def test_player_substring_fallback_runs_outside_deadline(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 200000) "
+                         "INSERT INTO players (id, name, first_name, last_name) "
+                         "SELECT 'x' || i, 'Filler ' || i, 'Filler', 'Player ' || i FROM n")
+            conn.execute("ANALYZE")
+            conn.commit()
+            # The scan alone outlasts the budget...
+            with pytest.raises(sqlite3.OperationalError, match="interrupted"):
+                with cache_db.query_deadline(0.02):
+                    conn.execute(cache_db.SQL_PLAYER_IDS_BY_SUBSTRING, ("%nobody%",) * 3).fetchall()
+        # ...but a lookup that falls back to it still completes
+        assert cache_db.get_cache_entry(player="nobody", timeout=0.02) is None
+
+    def test_cache_endpoint_returns_504_on_interrupted_lookup(self):
+        with patch("main.get_cache_entry", side_effect=sqlite3.OperationalError("interrupted")) as lookup:
+            r = CLIENT.get("/cache", params={"market": "moneyline"}, headers=user_headers())
+        assert r.status_code == 504
+        assert lookup.call_args.kwargs["timeout"] == cache_db.QUERY_TIMEOUT
+
+    def test_executor_runs_lookups_off_event_loop_thread(self, sports_db):
+        import asyncio
+        import threading
+
+        result, thread_name = asyncio.run(cache_db.run_in_db_executor(
+            lambda **kw: (cache_db.get_cache_entry(**kw), threading.current_thread().name),
+            team="Arsenal", sport="Soccer"))
+        assert [t["normalized_name"] for t in result["teams"]] == ["Arsenal"]
+        assert thread_name.startswith("sqlite")
+
+
+def _query_plan(conn, sql, params):
+    # The fixture tables are tiny, so ANALYZE stats make full scans the cheapest
+    # plan. Drop them to plan as SQLite would for unanalyzed, full-size tables.
+    conn.execute("DELETE FROM sqlite_stat1")
+    conn.execute("ANALYZE sqlite_master")
+    return " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+class TestSearchColumns:
+    def test_migration_backfills_lowercase_columns(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            row = conn.execute("SELECT name_lc, nickname_lc, abbr_lc FROM teams WHERE id = 't1'").fetchone()
+        assert tuple(row) == ("los angeles lakers", "lakers", "lal")
+
+    def test_migration_backfills_player_full_name(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            row = conn.execute("SELECT name_lc, full_name_lc FROM players WHERE id = 'p1'").fetchone()
+        assert tuple(row) == ("lebron james", "lebron james")
+
+    def test_sqlite_lower_matches_sqlite(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            for value in ("LeBron James", "ÖREBRO SK", "Zürich"):
+                assert cache_db._sqlite_lower(f"  {value} ") == conn.execute("SELECT lower(?)", (value,)).fetchone()[0]
+
+    def test_migration_is_idempotent(self, sports_db):
+        cache_db.init_search_columns()
+        cache_db.init_search_columns()
+
+    def test_check_reports_migrated_db(self, sports_db):
+        assert cache_db.check_search_columns() is True
+        assert cache_db.SEARCH_COLUMNS_READY is True
+
+    def test_unmigrated_db_falls_back_to_unindexed_queries(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "sports_data.db"
+        with sqlite3.connect(db_path) as conn:
+            conn.executescript(_SPORTS_SCHEMA)
+        cache_db.close_pool()
+        cache_db.clear_local_cache()
+        monkeypatch.setattr(cache_db, "DB_PATH", str(db_path))
+        try:
+            assert [t["normalized_name"] for t in cache_db.get_cache_entry(team="LAL", sport="Basketball")["teams"]] == ["Los Angeles Lakers"]
+            assert [t["normalized_name"] for t in cache_db.get_cache_entry(team="gunn", sport="Soccer")["teams"]] == ["Arsenal"]
+            assert [p["normalized_name"] for p in cache_db.get_cache_entry(player="LEBRON JAMES")["players"]] == ["LeBron James"]
+            data = cache_db.get_cache_entry(team="los ang", player="anthony davis", sport="Basketball")
+            assert [p["team"] for p in data["players"]] == ["Los Angeles Lakers"]
+            assert cache_db.SEARCH_COLUMNS_READY is False
+        finally:
+            cache_db.close_pool()
+            cache_db.clear_local_cache()
+
+    def test_unmigrated_queries_take_the_same_parameters(self):
+        for sql, fallback in cache_db._UNMIGRATED_SEARCH_SQL.items():
+            assert sql.count("?") == fallback.count("?")
+
+    def test_startup_survives_unmigrated_db(self):
+        with patch("main.check_search_columns", return_value=False) as check, \
+             patch("main.load_sport_ids", return_value={}):
+            with TestClient(app) as client:
+                assert client.get("/").status_code == 200
+        check.assert_called_once()
+
+    def test_inserted_and_renamed_teams_stay_searchable(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            conn.execute("INSERT INTO teams (id, name, abbreviation, nickname, league_id, sport_id) "
+                         "VALUES ('t9', 'Boston Celtics', 'BOS', 'Celtics', 'l1', 's1')")
+            conn.execute("UPDATE teams SET nickname = 'Lake Show' WHERE id = 't1'")
+            conn.commit()
+            rows = dict(conn.execute("SELECT id, nickname_lc FROM teams WHERE id IN ('t1', 't9')").fetchall())
+        assert rows == {"t1": "lake show", "t9": "celtics"}
+
+    def test_team_prefix_query_uses_index(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            plan = _query_plan(conn, cache_db.SQL_TEAM_IDS_BY_PREFIX, ("lak", "lal", "lak", "lal", "lak"))
+        assert "idx_teams_name_lc" in plan and "SCAN teams" not in plan
+
+    def test_player_exact_query_uses_indexes(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            plan = _query_plan(conn, cache_db.SQL_PLAYER_IDS_BY_NAME, ("x", "x"))
+        assert "idx_players_name_lc" in plan and "idx_players_full_name_lc" in plan
+
+    def test_team_sport_query_uses_composite_indexes(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            analyzed = conn.execute("SELECT COUNT(*) FROM sqlite_stat1 WHERE idx = 'idx_teams_sport_id_name_lc'").fetchone()[0]
+            plan = _query_plan(conn, cache_db.SQL_TEAM_IDS_BY_PREFIX_AND_SPORT, ("x", "y", "x", "y", "x", "basketball"))
+        assert analyzed == 1
+        assert "idx_teams_sport_id_name_lc" in plan
+
+    def test_migration_creates_only_query_plan_indexes(self, sports_db):
+        with cache_db.borrow_connection() as conn:
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")}
+        assert indexes == set(cache_db.SEARCH_INDEXES) | set(cache_db.QUERY_PLAN_INDEXES)
+        assert "idx_sports_name_lc" not in indexes
+
+    def test_team_with_players_query_needs_no_sort(self, sports_db):
+        sql = cache_db.SQL_TEAMS_WITH_PLAYERS_BY_IDS_AND_SPORT.format(placeholders="?,?")
+        with cache_db.borrow_connection() as conn:
+            plan = _query_plan(conn, sql, ("t1", "t2", "s1"))
+        assert "idx_players_team_id_name" in plan and "TEMP B-TREE" not in plan
+
+    def test_prefix_range_bounds(self):
+        assert cache_db._prefix_range("lak") == ("lak", "lal")
+        assert cache_db._prefix_range("a\U0010ffff") == ("a\U0010ffff", "b")
+        assert cache_db._prefix_range("a\ud7ff") == ("a\ud7ff", "a\ue000")
+        lo, hi = cache_db._prefix_range("lak")
+        assert all(lo <= v < hi for v in ("lak", "lakers", "lak\U0010ffff"))
+        assert not any(lo <= v < hi for v in ("laj", "lal", "la"))
+
+
+class TestLocalCache:
+    def test_repeat_lookup_skips_database(self, sports_db):
+        first = cache_db.get_cache_entry(team="Arsenal", sport="Soccer")
+        with patch("cache_db._query_cache_entry") as query:
+            again = cache_db.get_cache_entry(team="  ARSENAL ", sport="soccer")
+        query.assert_not_called()
+        assert again == first
+
+    def test_cached_entry_is_not_shared_with_callers(self, sports_db):
+        first = cache_db.get_cache_entry(team="Arsenal", sport="Soccer")
+        first["teams"].clear()
+        again = cache_db.get_cache_entry(team="Arsenal", sport="Soccer")
+        assert again["team_count"] == 1 and len(again["teams"]) == 1
+
+    def test_entries_are_stored_serialized(self, sports_db):
+        data = cache_db.get_cache_entry(market="moneyline")
+        (_, stored), = cache_db._local_cache.values()
+        assert isinstance(stored, bytes) and orjson.loads(stored) == data
+
+    def test_not_found_is_not_cached(self, sports_db):
+        assert cache_db.get_cache_entry(team="Chelsea", sport="Soccer") is None
+        assert not cache_db._local_cache
+
+    def test_entries_expire(self, sports_db, monkeypatch):
+        monkeypatch.setattr(cache_db, "LOCAL_CACHE_TTL", -1)
+        cache_db.get_cache_entry(market="moneyline")
+        assert cache_db._local_cache_get(cache_db._local_cache_key("moneyline", None, None, None, None)) is None
+
+    def test_least_recently_used_entry_is_evicted(self, sports_db, monkeypatch):
+        monkeypatch.setattr(cache_db, "LOCAL_CACHE_SIZE", 2)
+        for key in ("a", "b", "c"):
+            cache_db._local_cache_put((key,), {"v": key})
+        assert list(cache_db._local_cache) == [("b",), ("c",)]
+
+    def test_clear_single_entry(self, sports_db):
+        cache_db.get_cache_entry(market="moneyline")
+        cache_db.get_cache_entry(market="spread")
+        cache_db.clear_local_cache(market="Moneyline")
+        assert list(cache_db._local_cache) == [cache_db._local_cache_key("spread", None, None, None, None)]